@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecovest.settings')
 
 application = get_asgi_application()
+
+# Load the impact models before the first request when IMPACT_PRELOAD_MODELS is set
+from investments.apps import preload_impact_models  # noqa: E402
+preload_impact_models()
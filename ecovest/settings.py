@@ -84,10 +84,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # File-backed test database so tests can run concurrent requests from threads
+        # (the default in-memory database locks whole tables between connections)
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    # Impact profiles are stamped with their inputs, so a per-process cache is safe for them
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by all workers; investments migration 0011 creates (and on reverse
+    # drops) the 'dashboard_cache' table, so keep LOCATION in step with it.
+    # Point this at Redis when one is available.
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'dashboard_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -138,4 +162,53 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 LOGIN_REDIRECT_URL = '/users/dashboard/'  # Redirect to dashboard after login
 LOGOUT_REDIRECT_URL = '/accounts/login/'  # Redirect to login page after logout (optional)
-LOGIN_URL = '/accounts/login/'           # Ensure login URL is explicit (optional)
\ No newline at end of file
+LOGIN_URL = '/accounts/login/'           # Ensure login URL is explicit (optional)
+
+# Impact prediction
+# Variation applied to predicted impacts: 'deterministic' (stable per input, cacheable),
+# 'random' (legacy ±5% jitter on every call) or 'none'
+IMPACT_VARIATION_MODE = 'deterministic'
+IMPACT_VARIATION_SEED = 0
+
+# Seconds to keep per-initiative impact profiles in the cache
+IMPACT_PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds to keep a user's dashboard portfolio summary; changes invalidate it sooner
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+# Cache holding the dashboard summaries. Invalidations must reach every worker, so it
+# has to be shared between processes (database, Redis or Memcached); summaries are
+# not cached at all with a per-process backend such as LocMemCache
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+
+# Versioned, memory-mapped model bundles shared by all workers (see train_impact_models)
+IMPACT_MODEL_ROOT = BASE_DIR / 'investments/models'
+# Seconds between checks of the CURRENT model pointer for a newly activated version
+IMPACT_MODEL_RELOAD_INTERVAL = 5
+
+# Milliseconds a batch of concurrent impact previews stays open once several are
+# waiting (0 disables batching) and the largest batch resolved at once
+IMPACT_BATCH_WINDOW_MS = 2
+IMPACT_BATCH_MAX_SIZE = 256
+
+# Load the impact models when the WSGI/ASGI application is created instead of on
+# the first request; enable for servers that fork workers after loading the
+# application (e.g. gunicorn --preload). manage.py commands never preload.
+IMPACT_PRELOAD_MODELS = False
+
+# Impact prediction logs go to the 'investments' loggers; set the level to DEBUG
+# to trace individual predictions (records are only formatted when enabled)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'investments': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
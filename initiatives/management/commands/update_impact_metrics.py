@@ -1,10 +1,83 @@
-from django.core.management.base import BaseCommand
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
 from initiatives.models import Initiative
+from investments.bulk import update_rows
+from investments.impact_profiles import get_impact_calculator
 from investments.models import Investment
-import time
+
+# Only the columns needed to predict and compare the stored metrics
+PREDICTION_FIELDS = [
+    'title', 'duration_months', 'project_scale', 'location', 'technology_type', 'updated_at',
+]
+
+
+def compute_chunk(pks):
+    """Recompute the metrics of one chunk of initiatives without saving them.
+
+    Returns (initiatives with the new metrics set, number whose metrics changed,
+    [(initiative, old metrics, new impact)]).
+    """
+    initiatives = list(
+        Initiative.objects.filter(pk__in=pks).order_by('pk')
+        .only(*PREDICTION_FIELDS, *Initiative.IMPACT_METRIC_FIELDS)
+        .prefetch_related('categories')
+    )
+    impacts = Investment.calculate_impact_for_initiatives(initiatives, 1000)
+    model_version = get_impact_calculator().version
+    computed_at = timezone.now()
+
+    rows = []
+    changed = 0
+    for initiative, impact in zip(initiatives, impacts):
+        old_metrics = {
+            'carbon': initiative.carbon_reduction_per_investment,
+            'energy': initiative.energy_savings_per_investment,
+            'water': initiative.water_savings_per_investment
+        }
+        if old_metrics != impact or initiative.impact_model_version != model_version:
+            changed += 1
+        rows.append((initiative, old_metrics, impact))
+
+        initiative.carbon_reduction_per_investment = impact['carbon']
+        initiative.energy_savings_per_investment = impact['energy']
+        initiative.water_savings_per_investment = impact['water']
+        initiative.impact_model_version = model_version
+        initiative.impact_computed_at = computed_at
+
+    return initiatives, changed, rows
+
+
+def compute_chunk_in_worker(pks):
+    """Pool task: recompute a chunk and return picklable (pk, *metric fields) rows"""
+    initiatives, changed, _ = compute_chunk(pks)
+    return [
+        (initiative.pk, *[getattr(initiative, name) for name in Initiative.IMPACT_METRIC_FIELDS])
+        for initiative in initiatives
+    ], changed
+
+
+def save_metrics(initiatives):
+    # Skips auto_now, so updated_at stays behind impact_computed_at and the
+    # rows do not look changed again
+    update_rows(Initiative, initiatives, Initiative.IMPACT_METRIC_FIELDS)
+
+
+def init_worker():
+    # Needed when workers are spawned rather than forked
+    import django
+    django.setup()
+
 
 class Command(BaseCommand):
-    help = 'Updates all initiatives with fresh impact metrics from the improved ImpactCalculator'
+    help = 'Updates initiatives with fresh impact metrics from the current impact model'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -12,50 +85,109 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be updated without actually updating the database',
         )
+        parser.add_argument(
+            '--since',
+            help='Only initiatives updated at or after this date or ISO datetime',
+        )
+        parser.add_argument(
+            '--changed-only',
+            action='store_true',
+            help='Only initiatives whose inputs changed since their metrics were computed, '
+                 'or whose metrics come from another model version',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Initiatives predicted and written per batch')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes to spread the predictions over; rows are written by the main process',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
         if dry_run:
             self.stdout.write(self.style.WARNING('Running in DRY RUN mode - no changes will be saved'))
-        
+
+        pks = list(self.selected_initiatives(options).order_by('pk').values_list('pk', flat=True))
+        chunks = [pks[i:i + chunk_size] for i in range(0, len(pks), chunk_size)]
+        self.stdout.write(f"Updating impact metrics for {len(pks)} initiatives in {len(chunks)} chunks...")
+
+        started = time.perf_counter()
+        if options['workers'] > 1 and not dry_run and len(chunks) > 1:
+            total, changed = self.update_in_pool(chunks, options['workers'])
+        else:
+            total, changed = self.update_in_process(chunks, dry_run)
+        elapsed = time.perf_counter() - started
+
+        rate = total / elapsed if elapsed else 0
+        summary = f"{total} initiatives ({changed} with new metrics) in {elapsed:.2f}s, {rate:,.0f}/s"
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Dry run completed for {summary}. No changes were made.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Updated {summary}.'))
+
+    def selected_initiatives(self, options):
         initiatives = Initiative.objects.all()
-        count = initiatives.count()
-        self.stdout.write(f"Updating impact metrics for {count} initiatives...")
-        
-        for i, initiative in enumerate(initiatives):
-            old_metrics = {
-                'carbon': initiative.carbon_reduction_per_investment,
-                'energy': initiative.energy_savings_per_investment,
-                'water': initiative.water_savings_per_investment
-            }
-            
-            # Enable storing of metrics
-            if not dry_run:
-                initiative._store_metrics = True
-            
-            # Calculate fresh metrics
-            impact = Investment.calculate_impact_for_amount(initiative, 1000)
-            
-            # If dry run, don't save but show differences
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                date = parse_date(options['since'])
+                if date is None:
+                    raise CommandError(f"Invalid --since value '{options['since']}'; use YYYY-MM-DD or an ISO datetime")
+                since = datetime.datetime.combine(date, datetime.time.min)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            initiatives = initiatives.filter(updated_at__gte=since)
+        if options['changed_only']:
+            initiatives = initiatives.filter(
+                Q(impact_computed_at__isnull=True)
+                | Q(updated_at__gt=F('impact_computed_at'))
+                | ~Q(impact_model_version=get_impact_calculator().version)
+            )
+        return initiatives
+
+    def update_in_process(self, chunks, dry_run):
+        total = changed = 0
+        for pks in chunks:
+            initiatives, chunk_changed, rows = compute_chunk(pks)
+            total += len(initiatives)
+            changed += chunk_changed
             if dry_run:
-                self.stdout.write(f"[{i+1}/{count}] {initiative.title} (ID: {initiative.id}):")
-                self.stdout.write(f"  OLD: Carbon: {old_metrics['carbon']:.2f} kg CO₂, Energy: {old_metrics['energy']:.2f} kWh, Water: {old_metrics['water']:.2f} L")
-                self.stdout.write(f"  NEW: Carbon: {impact['carbon']:.2f} kg CO₂, Energy: {impact['energy']:.2f} kWh, Water: {impact['water']:.2f} L")
-                
-                # Show percentage change for each metric
-                carbon_change = ((impact['carbon'] - old_metrics['carbon']) / old_metrics['carbon'] * 100) if old_metrics['carbon'] else float('inf')
-                energy_change = ((impact['energy'] - old_metrics['energy']) / old_metrics['energy'] * 100) if old_metrics['energy'] else float('inf')
-                water_change = ((impact['water'] - old_metrics['water']) / old_metrics['water'] * 100) if old_metrics['water'] else float('inf')
-                
-                self.stdout.write(f"  CHANGE: Carbon: {carbon_change:+.1f}%, Energy: {energy_change:+.1f}%, Water: {water_change:+.1f}%")
+                for initiative, old_metrics, impact in rows:
+                    self.write_diff(initiative, old_metrics, impact)
             else:
-                self.stdout.write(f"[{i+1}/{count}] Updated '{initiative.title}' with new impact metrics")
-            
-            # Small delay to see output
-            time.sleep(0.1)
-        
-        if dry_run:
-            self.stdout.write(self.style.SUCCESS('Dry run completed. No changes were made.'))
-        else:
-            self.stdout.write(self.style.SUCCESS('All initiatives updated successfully with fresh impact metrics.'))
\ No newline at end of file
+                save_metrics(initiatives)
+                self.stdout.write(f"  {total} done")
+        return total, changed
+
+    def update_in_pool(self, chunks, workers):
+        # Children open their own connections; close ours so forked workers do not share it
+        connections.close_all()
+        total = changed = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            # Workers only read and predict; writing here avoids lock contention between them
+            for values, chunk_changed in pool.map(compute_chunk_in_worker, chunks):
+                save_metrics([
+                    Initiative(pk=row[0], **dict(zip(Initiative.IMPACT_METRIC_FIELDS, row[1:])))
+                    for row in values
+                ])
+                total += len(values)
+                changed += chunk_changed
+                self.stdout.write(f"  {total} done")
+        return total, changed
+
+    def write_diff(self, initiative, old_metrics, impact):
+        self.stdout.write(f"{initiative.title} (ID: {initiative.id}):")
+        self.stdout.write(f"  OLD: Carbon: {old_metrics['carbon']:.2f} kg CO₂, Energy: {old_metrics['energy']:.2f} kWh, Water: {old_metrics['water']:.2f} L")
+        self.stdout.write(f"  NEW: Carbon: {impact['carbon']:.2f} kg CO₂, Energy: {impact['energy']:.2f} kWh, Water: {impact['water']:.2f} L")
+
+        # Show percentage change for each metric
+        carbon_change = ((impact['carbon'] - old_metrics['carbon']) / old_metrics['carbon'] * 100) if old_metrics['carbon'] else float('inf')
+        energy_change = ((impact['energy'] - old_metrics['energy']) / old_metrics['energy'] * 100) if old_metrics['energy'] else float('inf')
+        water_change = ((impact['water'] - old_metrics['water']) / old_metrics['water'] * 100) if old_metrics['water'] else float('inf')
+
+        self.stdout.write(f"  CHANGE: Carbon: {carbon_change:+.1f}%, Energy: {energy_change:+.1f}%, Water: {water_change:+.1f}%")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('initiatives', '0017_initiative_impact_model_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='initiative',
+            name='impact_computed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,7 +1,19 @@
 from datetime import timedelta
-from django.db import models
+from decimal import Decimal
+from django.db import connections, models, router, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.sql import UpdateQuery
 from django.core.validators import MinValueValidator
-from investments.portfolio_analyzer import PortfolioAnalyzer
+
+
+class FundingError(Exception):
+    """Raised when an investment does not fit in what an initiative still needs"""
+
+
+# Placeholders in the parameters of Initiative.funding_update_sql()
+FUNDING_AMOUNT = object()
+FUNDING_PK = object()
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, choices=[
@@ -76,6 +88,14 @@ class Initiative(models.Model):
         ('medium', 'Medium Risk'),
         ('high', 'High Risk')
     ]
+    # Fields written when the per-investment impact metrics are recomputed
+    IMPACT_METRIC_FIELDS = [
+        'carbon_reduction_per_investment',
+        'energy_savings_per_investment',
+        'water_savings_per_investment',
+        'impact_model_version',
+        'impact_computed_at',
+    ]
     title = models.CharField(max_length=200)
     description = models.TextField()
     categories = models.ManyToManyField(Category, related_name='initiatives')
@@ -95,6 +115,8 @@ class Initiative(models.Model):
     carbon_reduction_per_investment = models.FloatField(default=0)
     energy_savings_per_investment = models.FloatField(default=0)
     water_savings_per_investment = models.FloatField(default=0)
+    impact_model_version = models.CharField(max_length=32, blank=True, default='')  # Model behind the per-investment metrics
+    impact_computed_at = models.DateTimeField(null=True, blank=True)  # When the per-investment metrics were last computed
     carbon_impact = models.FloatField(default=0)  # CO2 reduction in kg
     energy_impact = models.FloatField(default=0)  # Energy saved in kWh
     water_impact = models.FloatField(default=0)   # Water saved in liters
@@ -113,13 +135,121 @@ class Initiative(models.Model):
         return self.title
 
     def calculate_risk_score(self):
+        from investments.portfolio_analyzer import PortfolioAnalyzer
         analyzer = PortfolioAnalyzer()
         return analyzer.calculate_risk_score(self)
     
     def get_risk_label(self):
+        from investments.portfolio_analyzer import PortfolioAnalyzer
         analyzer = PortfolioAnalyzer()
         return analyzer.get_risk_label(self.calculate_risk_score())
 
+    @staticmethod
+    def funding_update(amount):
+        """Return (condition, changes) of the conditional UPDATE adding amount to an initiative.
+
+        An addition only applies to an initiative that is not yet funded and has
+        room for it, and flips status to 'funded' when the goal is reached; a
+        withdrawal reopens a funded initiative that drops below its goal.
+        """
+        condition = Q()
+        changes = {'current_amount': F('current_amount') + amount}
+        if amount > 0:
+            condition = ~Q(status='funded') & Q(current_amount__lte=F('goal_amount') - amount)
+            # Column references in SET see the values from before the update
+            changes['status'] = Case(
+                When(current_amount__gte=F('goal_amount') - amount, then=Value('funded')),
+                default=F('status'),
+            )
+        elif amount < 0:
+            # A withdrawal below the goal reopens a funded initiative
+            changes['status'] = Case(
+                When(status='funded', current_amount__lt=F('goal_amount') - amount, then=Value('active')),
+                default=F('status'),
+            )
+        return condition, changes
+
+    def add_funding(self, amount):
+        """Atomically add amount (negative to withdraw) to current_amount.
+
+        One conditional UPDATE (see funding_update) applies the change, so
+        concurrent investments can neither lose updates nor overshoot the goal.
+        Raises FundingError when an addition is refused. Refreshes
+        current_amount and status on this instance.
+        """
+        condition, changes = self.funding_update(Decimal(amount))
+        updated = Initiative.objects.filter(condition, pk=self.pk).update(**changes)
+        self.refresh_from_db(fields=['current_amount', 'status', 'goal_amount'])
+        if not updated:
+            if self.status == 'funded':
+                raise FundingError('This initiative is already fully funded.')
+            raise FundingError(
+                f'This initiative only needs ₹{self.goal_amount - self.current_amount:,} more to be fully funded.'
+            )
+
+    @classmethod
+    def add_funding_many(cls, amounts):
+        """Add {initiative id: amount} of funding in one transaction; returns the ids that were refused.
+
+        Each initiative gets the same conditional UPDATE as add_funding(). The
+        statement is compiled from funding_update() once per sign and executed
+        with each initiative's values, since building it through the ORM costs
+        over a millisecond per initiative in bulk imports. Instances in memory
+        are not refreshed.
+        """
+        using = router.db_for_write(cls)
+        connection = connections[using]
+        statements = {}
+        refused = []
+        with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+            for pk, amount in amounts.items():
+                amount = Decimal(amount)
+                if not amount:
+                    continue
+                positive = amount > 0
+                if positive not in statements:
+                    statements[positive] = cls.funding_update_sql(positive, using)
+                sql, params = statements[positive]
+                cursor.execute(sql, [amount if p is FUNDING_AMOUNT else pk if p is FUNDING_PK else p for p in params])
+                if cursor.rowcount != 1:
+                    refused.append(pk)
+        return refused
+
+    @classmethod
+    def funding_update_sql(cls, positive, using):
+        """Compile funding_update() for a positive or negative amount into (sql, params).
+
+        The update is compiled for two different amounts and primary keys, and
+        the parameter positions that differ between the two are the ones holding
+        the amount and the primary key; they become FUNDING_AMOUNT and FUNDING_PK
+        placeholders, to be replaced before executing the statement. Raises
+        ValueError if the two compilations do not line up that way.
+        """
+        compiled = []
+        for amount, pk in ((Decimal('1.25'), 1), (Decimal('2.5'), 2)):
+            amount = amount if positive else -amount
+            condition, changes = cls.funding_update(amount)
+            query = cls.objects.filter(condition, pk=pk).query.chain(UpdateQuery)
+            query.add_update_values(changes)
+            compiled.append((amount, pk) + query.get_compiler(using).as_sql())
+        (amount_a, pk_a, sql, params_a), (amount_b, pk_b, sql_b, params_b) = compiled
+        if sql != sql_b or len(params_a) != len(params_b):
+            raise ValueError('The funding update compiles to different statements for different amounts')
+
+        params = []
+        for a, b in zip(params_a, params_b):
+            if a == b:
+                params.append(a)
+            elif (a, b) == (amount_a, amount_b):
+                params.append(FUNDING_AMOUNT)
+            elif (a, b) == (pk_a, pk_b):
+                params.append(FUNDING_PK)
+            else:
+                raise ValueError(f'Unexpected parameters {a!r} and {b!r} in the compiled funding update')
+        if params.count(FUNDING_PK) != 1 or FUNDING_AMOUNT not in params:
+            raise ValueError('The compiled funding update is missing its amount or primary key')
+        return sql, params
+
     def get_progress_percentage(self):
         if self.goal_amount == 0:
             return 0
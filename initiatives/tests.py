@@ -1,3 +1,106 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.db.models import F, Q
+from django.db.models.sql import UpdateQuery
 from django.test import TestCase
 
-# Create your tests here.
+from .models import FUNDING_AMOUNT, FUNDING_PK, FundingError, Initiative
+
+
+class AddFundingTests(TestCase):
+    def setUp(self):
+        self.initiative = Initiative.objects.create(
+            title='Solar rooftops', description='Test', status='active',
+            goal_amount=Decimal('1000'), current_amount=Decimal('600')
+        )
+
+    def assert_funding(self, current_amount, status):
+        self.initiative.refresh_from_db()
+        self.assertEqual((self.initiative.current_amount, self.initiative.status), (Decimal(current_amount), status))
+
+    def test_exact_fill_marks_the_initiative_funded(self):
+        self.initiative.add_funding(Decimal('400'))
+        self.assertEqual(self.initiative.status, 'funded')
+        self.assert_funding('1000', 'funded')
+
+    def test_addition_above_the_remaining_amount_is_refused(self):
+        with self.assertRaisesMessage(FundingError, 'only needs ₹400.00 more'):
+            self.initiative.add_funding(Decimal('400.01'))
+        self.assert_funding('600', 'active')
+
+    def test_funded_initiative_refuses_more_funding(self):
+        Initiative.objects.filter(pk=self.initiative.pk).update(status='funded')
+        with self.assertRaisesMessage(FundingError, 'already fully funded'):
+            self.initiative.add_funding(Decimal('100'))
+        self.assert_funding('600', 'funded')
+
+    def test_withdrawal_reopens_a_funded_initiative(self):
+        self.initiative.add_funding(Decimal('400'))
+        self.initiative.add_funding(Decimal('-250'))
+        self.assertEqual(self.initiative.status, 'active')
+        self.assert_funding('750', 'active')
+
+    def test_withdrawal_keeps_other_statuses(self):
+        Initiative.objects.filter(pk=self.initiative.pk).update(status='draft')
+        self.initiative.add_funding(Decimal('-100'))
+        self.assert_funding('500', 'draft')
+
+
+class AddFundingManyTests(TestCase):
+    def create(self, current_amount, status='active'):
+        return Initiative.objects.create(
+            title='Solar rooftops', description='Test', status=status,
+            goal_amount=Decimal('1000'), current_amount=Decimal(current_amount)
+        )
+
+    def test_matches_add_funding(self):
+        cases = [
+            ('600', 'active', '400'),  # exact fill
+            ('600', 'active', '399.99'),
+            ('600', 'active', '400.01'),  # overshoot
+            ('1000', 'funded', '1'),  # already funded
+            ('1000', 'funded', '-0.01'),  # withdrawal reopens
+            ('900', 'draft', '-100'),
+        ]
+        for current_amount, status, amount in cases:
+            with self.subTest(current_amount=current_amount, status=status, amount=amount):
+                single, many = self.create(current_amount, status), self.create(current_amount, status)
+                try:
+                    single.add_funding(Decimal(amount))
+                    refused = []
+                except FundingError:
+                    refused = [many.pk]
+                self.assertEqual(Initiative.add_funding_many({many.pk: Decimal(amount)}), refused)
+                single.refresh_from_db()
+                many.refresh_from_db()
+                self.assertEqual((many.current_amount, many.status), (single.current_amount, single.status))
+
+    def test_compiled_statement_substitutes_amount_and_pk_by_position(self):
+        # Values that also appear among the statement's other parameters
+        for amount, pk in ((Decimal('1000'), 1000), (Decimal('-1'), 1)):
+            with self.subTest(amount=amount, pk=pk):
+                condition, changes = Initiative.funding_update(amount)
+                query = Initiative.objects.filter(condition, pk=pk).query.chain(UpdateQuery)
+                query.add_update_values(changes)
+                expected = query.get_compiler('default').as_sql()
+                sql, params = Initiative.funding_update_sql(amount > 0, 'default')
+                self.assertEqual(params.count(FUNDING_PK), 1)
+                substituted = [amount if p is FUNDING_AMOUNT else pk if p is FUNDING_PK else p for p in params]
+                self.assertEqual((sql, tuple(substituted)), (expected[0], tuple(expected[1])))
+
+    def test_compiled_statement_without_the_amount_is_refused(self):
+        def funding_update(amount):
+            return Q(status='active'), {'current_amount': F('current_amount') + Decimal('1')}
+
+        with mock.patch.object(Initiative, 'funding_update', staticmethod(funding_update)):
+            with self.assertRaisesMessage(ValueError, 'missing its amount or primary key'):
+                Initiative.funding_update_sql(True, 'default')
+
+    def test_compiled_statement_with_unexpected_parameters_is_refused(self):
+        def funding_update(amount):
+            return Q(current_amount__lt=amount * 2), {'current_amount': F('current_amount') + amount}
+
+        with mock.patch.object(Initiative, 'funding_update', staticmethod(funding_update)):
+            with self.assertRaisesMessage(ValueError, 'Unexpected parameters'):
+                Initiative.funding_update_sql(True, 'default')
@@ -38,11 +38,11 @@ def initiative_list(request):
     total_investors = Initiative.objects.aggregate(total=Count('investments__user', distinct=True))['total']
     total_invested = Initiative.objects.aggregate(total=Sum('current_amount'))['total'] or 0
     
-    # Calculate impact for ₹1000 using static method
+    # Calculate impact for ₹1000 for all initiatives in one batch
+    initiatives = list(initiatives)
+    impacts = Investment.calculate_impact_for_initiatives(initiatives, 1000)
     total_carbon = 0
-    for initiative in initiatives:
-        impact = Investment.calculate_impact_for_amount(initiative, 1000)
-        print(f"Initiative: {initiative.title}, Predicted Impact: {impact}")  # Debugging log
+    for initiative, impact in zip(initiatives, impacts):
         initiative.impact_for_1000 = {k: round(float(v), 2) for k, v in impact.items()}  # Ensure numeric values
         total_carbon += initiative.impact_for_1000.get('carbon', 0)
     
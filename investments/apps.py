@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def preload_impact_models():
+    """Warm up: import NumPy and load the shared ImpactCalculator now instead of on the first request.
+
+    Called from the WSGI/ASGI entry points when IMPACT_PRELOAD_MODELS is set, so
+    web workers start warm while manage.py commands stay lightweight. Under a
+    pre-forking server (e.g. gunicorn --preload) every worker then shares the
+    mapped models.
+    """
+    if getattr(settings, 'IMPACT_PRELOAD_MODELS', False):
+        from investments.impact_calculator import get_impact_calculator
+        get_impact_calculator()
 
 
 class InvestmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'investments'
+
+    def ready(self):
+        import investments.signals
@@ -0,0 +1,143 @@
+"""Micro-batching of impact predictions for concurrent requests.
+
+The invest page asks for an impact preview on every keystroke, so a busy worker
+sees many small predictions arriving within a few milliseconds of each other.
+ImpactBatcher collects them on a queue and resolves each batch with one
+vectorized predict_from_profiles() call. A lone request is resolved at once;
+when others are already waiting, the batch stays open for up to
+IMPACT_BATCH_WINDOW_MS. Callers fetch the initiative's impact profile
+themselves (it may need the database) and only the amount-dependent part of
+the prediction goes through the batcher.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from investments.impact_profiles import get_impact_calculator
+from investments.instrumentation import logger, metrics
+
+# Bucket bounds for the batch size histogram
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+class ImpactBatcher:
+    """Resolves queued (profile, amount) predictions in batches on a worker thread.
+
+    Use predict() from sync views and apredict() from async views; both return
+    the same dict as ImpactCalculator.predict_from_profiles() gives per row.
+    """
+
+    def __init__(self, window=0.002, max_batch=256):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def submit(self, profile, amount):
+        """Queue one prediction and return a concurrent.futures.Future for its impact"""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((profile, float(amount), future))
+        return future
+
+    def predict(self, profile, amount, timeout=None):
+        return self.submit(profile, amount).result(timeout)
+
+    async def apredict(self, profile, amount):
+        return await asyncio.wrap_future(self.submit(profile, amount))
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so a forked worker starts its own
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='impact-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first request, then take whatever else is already queued.
+
+        A lone request is resolved at once. Only when others are waiting, which
+        means requests are arriving concurrently, does the batch stay open for
+        the rest of the window.
+        """
+        batch = [self._queue.get()]
+        self._drain(batch)
+        if len(batch) == 1:
+            return batch
+
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while True:
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self._resolve(batch)
+
+    def _resolve(self, batch):
+        metrics.observe('impact.batch_size', len(batch), BATCH_SIZE_BUCKETS)
+        try:
+            impacts = get_impact_calculator().predict_from_profiles(
+                [profile for profile, _, _ in batch],
+                [amount for _, amount, _ in batch]
+            )
+        except Exception as e:
+            logger.exception("Batched impact prediction of %d rows failed", len(batch))
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), impact in zip(batch, impacts):
+            future.set_result(impact)
+
+
+def get_impact_batcher():
+    """Return the process-wide ImpactBatcher, or None when batching is disabled"""
+    global _batcher
+    window_ms = getattr(settings, 'IMPACT_BATCH_WINDOW_MS', 2)
+    if not window_ms:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = ImpactBatcher(window_ms / 1000, getattr(settings, 'IMPACT_BATCH_MAX_SIZE', 256))
+    return _batcher
+
+
+def predict_impact(profile, amount):
+    """Predict one impact through the batcher, or directly when batching is disabled"""
+    batcher = get_impact_batcher()
+    if batcher is None:
+        return get_impact_calculator().predict_from_profiles([profile], float(amount))[0]
+    return batcher.predict(profile, amount)
+
+
+async def apredict_impact(profile, amount):
+    batcher = get_impact_batcher()
+    if batcher is None:
+        return get_impact_calculator().predict_from_profiles([profile], float(amount))[0]
+    return await batcher.apredict(profile, amount)
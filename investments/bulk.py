@@ -0,0 +1,37 @@
+"""Fast bulk writes for recomputed rows.
+
+QuerySet.bulk_update() builds a CASE WHEN expression per field and row, which
+costs about a millisecond per row in Python before the database sees the query.
+update_rows() sends one parameterized UPDATE per row through executemany()
+instead, inside a single transaction, after preparing every value with the
+field's own get_db_prep_save().
+"""
+from django.db import connections, router, transaction
+
+
+def update_rows(model, objs, fields, batch_size=1000):
+    """Write fields of already-saved objs by primary key; returns the number of rows sent.
+
+    Like bulk_update(), this skips save(), signals and auto_now fields.
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = model._meta
+    model_fields = [meta.get_field(name) for name in fields]
+
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in model_fields),
+        quote(meta.pk.column),
+    )
+
+    objs = list(objs)
+    with transaction.atomic(using=using, savepoint=False), connection.cursor() as cursor:
+        for start in range(0, len(objs), batch_size):
+            cursor.executemany(sql, [
+                [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields]
+                + [meta.pk.get_db_prep_save(obj.pk, connection)]
+                for obj in objs[start:start + batch_size]
+            ])
+    return len(objs)
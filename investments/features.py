@@ -0,0 +1,105 @@
+"""Feature layout shared by model training and impact prediction.
+
+FeatureSchema owns the category, location and technology vocabularies and the
+column order of the model input, so training and inference cannot drift apart.
+Lookups are plain dicts built once; encoding a batch is one pass over the rows.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+class FeatureSchema:
+    """Column layout and vocabulary lookups for the impact model features.
+
+    Model input columns, in order: investment amount, one indicator per
+    category, project duration (months), project scale, location code,
+    technology code and the amount × duration interaction term. Locations and
+    technologies are coded by their position in sorted order, which matches the
+    LabelEncoder codes the shipped models were trained on.
+    """
+
+    def __init__(self, categories, locations, technologies, default_location='Uttar Pradesh', default_technology='Manual'):
+        self.categories = tuple(categories)
+        self.locations = tuple(sorted(locations))
+        self.technologies = tuple(sorted(technologies))
+
+        self.category_index = {name: i for i, name in enumerate(self.categories)}
+        self.location_index = {name: i for i, name in enumerate(self.locations)}
+        self.technology_index = {name: i for i, name in enumerate(self.technologies)}
+        self.default_location_code = self.location_index[default_location]
+        self.default_technology_code = self.technology_index[default_technology]
+
+        # Arrays for mapping codes back to names in bulk
+        self.location_names = np.array(self.locations, dtype=object)
+        self.technology_names = np.array(self.technologies, dtype=object)
+
+        self.columns = (
+            ('investment_amount',)
+            + tuple(f'category:{name}' for name in self.categories)
+            + ('project_duration_months', 'project_scale', 'location', 'technology_type', 'amount_x_duration')
+        )
+        self.amount_column = 0
+        self.duration_column = 1 + len(self.categories)
+        self.interaction_column = len(self.columns) - 1
+
+    @property
+    def n_features(self):
+        return len(self.columns)
+
+    @classmethod
+    def from_choices(cls):
+        """Build the schema from the Category and Initiative model choices"""
+        from initiatives.models import Category, Initiative
+
+        return cls(
+            [name for name, _ in Category._meta.get_field('name').choices],
+            [name for name, _ in Initiative.LOCATION_CHOICES],
+            [name for name, _ in Initiative.TECHNOLOGY_CHOICES],
+        )
+
+    def encode_locations(self, locations):
+        """Location codes, mapping unknown locations to the default"""
+        index, default = self.location_index, self.default_location_code
+        return np.fromiter((index.get(loc, default) for loc in locations), dtype=np.intp, count=len(locations))
+
+    def encode_technologies(self, technologies):
+        """Technology codes, mapping unknown technologies to the default"""
+        index, default = self.technology_index, self.default_technology_code
+        return np.fromiter((index.get(tech, default) for tech in technologies), dtype=np.intp, count=len(technologies))
+
+    def category_matrix(self, category_names):
+        """(N, n_categories) indicator matrix; unknown category names are ignored"""
+        matrix = np.zeros((len(category_names), len(self.categories)), dtype=np.int8)
+        index = self.category_index
+        rows, columns = [], []
+        for row, names in enumerate(category_names):
+            for name in names:
+                column = index.get(name)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        matrix[rows, columns] = 1
+        return matrix
+
+    def build_matrix(self, amounts, category_matrix, durations, scales, location_codes, technology_codes):
+        """Raw (N, n_features) model input in schema column order"""
+        amounts = np.asarray(amounts, dtype=float)
+        durations = np.asarray(durations, dtype=float)
+        return np.column_stack([
+            amounts, category_matrix, durations, scales,
+            location_codes, technology_codes, amounts * durations
+        ]).astype(float)
+
+    def normalize(self, X):
+        """Log-transform the amount and interaction columns, as done for training"""
+        X = np.array(X, dtype=float)
+        X[:, self.amount_column] = np.log1p(X[:, self.amount_column])
+        X[:, self.interaction_column] = np.log1p(X[:, self.interaction_column])
+        return X
+
+
+@lru_cache(maxsize=None)
+def get_feature_schema():
+    """Return the process-wide FeatureSchema"""
+    return FeatureSchema.from_choices()
@@ -0,0 +1,102 @@
+"""Tree ensembles flattened into NumPy arrays for fast inference.
+
+scikit-learn validates its input and dispatches to every estimator separately
+on each predict() call, which dominates the cost of scoring a handful of rows.
+CompiledForest stores the nodes of every tree of every target in one set of
+flat arrays and walks all trees for all rows together, one tree level per step.
+"""
+import numpy as np
+
+# Rows evaluated per step; bounds the (rows, trees, targets) leaf value buffer
+CHUNK_SIZE = 1024
+
+
+class CompiledForest:
+    """Flat node arrays for a group of regression forests sharing one feature matrix.
+
+    Node arrays are indexed by global node id. Leaves point to themselves, so a
+    fixed number of steps equal to the deepest tree reaches every leaf. value
+    holds one column per target and weights[tree, target] is the share of each
+    tree in that target's average.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, weights, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.weights = weights
+        self.max_depth = max_depth
+
+    @property
+    def n_targets(self):
+        return self.value.shape[1]
+
+    @classmethod
+    def from_forests(cls, forests):
+        """Compile fitted forests into one CompiledForest.
+
+        forests is a list of fitted RandomForestRegressors. A single-output forest
+        fills the next target column and a multi-output forest fills as many
+        columns as it has outputs, so three per-target forests and one forest
+        trained on all three targets compile to the same layout.
+        """
+        n_targets = sum(forest.n_outputs_ for forest in forests)
+        features, thresholds, lefts, rights, values, roots, weights = [], [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        first_target = 0
+
+        for forest in forests:
+            estimators = forest.estimators_
+            targets = slice(first_target, first_target + forest.n_outputs_)
+            for estimator in estimators:
+                tree = estimator.tree_
+                node_ids = np.arange(tree.node_count)
+                is_leaf = tree.children_left == -1
+
+                features.append(np.where(is_leaf, 0, tree.feature))
+                thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+                lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+                rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+                tree_value = np.zeros((tree.node_count, n_targets))
+                tree_value[:, targets] = tree.value[:, :, 0]
+                values.append(tree_value)
+
+                tree_weights = np.zeros(n_targets)
+                tree_weights[targets] = 1.0 / len(estimators)
+                weights.append(tree_weights)
+
+                roots.append(offset)
+                max_depth = max(max_depth, tree.max_depth)
+                offset += tree.node_count
+            first_target = targets.stop
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            weights=np.vstack(weights),
+            max_depth=max_depth,
+        )
+
+    def predict(self, X):
+        """Return an (N, n_targets) array of forest predictions for the rows of X"""
+        # scikit-learn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        predictions = np.empty((len(X), self.n_targets))
+        for start in range(0, len(X), CHUNK_SIZE):
+            chunk = X[start:start + CHUNK_SIZE]
+            rows = np.arange(len(chunk))[:, None]
+            node = np.broadcast_to(self.roots, (len(chunk), len(self.roots)))
+            for _ in range(self.max_depth):
+                go_left = chunk[rows, self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            predictions[start:start + CHUNK_SIZE] = np.einsum('ntk,tk->nk', self.value[node], self.weights)
+        return predictions
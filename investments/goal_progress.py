@@ -0,0 +1,52 @@
+"""Progress of many investment goals from shared portfolio snapshots.
+
+A snapshot holds everything goal progress depends on for one user: the
+running totals on the profile and the category and technology distribution
+of the portfolio. portfolio_snapshots() builds them for any number of users
+with three grouped queries, so goal_progress() costs the same for one goal as
+for every goal of every user. InvestmentGoal.get_progress() goes through it
+too, and the update_goal_progress command materializes the results.
+"""
+from decimal import Decimal
+
+from investments.portfolio_analyzer import PortfolioAnalyzer
+from users.models import Profile
+
+SNAPSHOT_TOTALS = ['total_invested', 'carbon_reduced', 'energy_saved', 'water_conserved']
+
+
+def empty_snapshot():
+    return {
+        'total_invested': Decimal('0'),
+        'carbon_reduced': 0.0,
+        'energy_saved': 0.0,
+        'water_conserved': 0.0,
+        'category_distribution': {},
+        'technology_distribution': {},
+    }
+
+
+def portfolio_snapshots(user_ids, diversity=True):
+    """{user_id: snapshot} for the users; diversity=False skips the two distribution queries"""
+    user_ids = set(user_ids)
+    snapshots = {user_id: empty_snapshot() for user_id in user_ids}
+
+    for user_id, *totals in Profile.objects.filter(user_id__in=user_ids).values_list('user_id', *SNAPSHOT_TOTALS):
+        snapshots[user_id].update(zip(SNAPSHOT_TOTALS, totals))
+
+    if diversity:
+        for user_id, analysis in PortfolioAnalyzer().diversification_by_user(user_ids).items():
+            snapshots[user_id]['category_distribution'] = analysis['category_distribution']
+            snapshots[user_id]['technology_distribution'] = analysis['technology_distribution']
+
+    return snapshots
+
+
+def goal_progress(goals):
+    """Progress percentages of the goals, in order, from one snapshot per user"""
+    goals = list(goals)
+    snapshots = portfolio_snapshots(
+        {goal.user_id for goal in goals},
+        diversity=any(goal.goal_type == 'diversity' for goal in goals)
+    )
+    return [goal.progress_from(snapshots[goal.user_id]) for goal in goals]
@@ -1,381 +1,330 @@
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-import pickle
+import hashlib
 import os
+import threading
+import time
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from investments import model_store
+from investments.features import get_feature_schema
+from investments.impact_rules import compile_rules
+from investments.instrumentation import logger, metrics
+
+_calculator = None
+_calculator_lock = threading.Lock()
+_next_version_check = 0.0
+
+VARIATION_MODES = ('deterministic', 'random', 'none')
+
+
+class ImpactModelUnavailable(Exception):
+    """Raised when no trained model version can be loaded"""
+
+
+def model_root():
+    return os.fspath(getattr(settings, 'IMPACT_MODEL_ROOT', os.path.join(settings.BASE_DIR, 'investments/models')))
+
+
+def get_impact_calculator():
+    """Return the process-wide ImpactCalculator, loading the models on first use.
+
+    The instance is shared by every thread in the worker and must be treated as
+    read-only; use this instead of constructing ImpactCalculator() per request.
+    At most every IMPACT_MODEL_RELOAD_INTERVAL seconds the CURRENT model pointer
+    is re-read and a newly activated version is swapped in without a restart;
+    a version that fails to load is logged and the loaded one keeps serving.
+    """
+    global _calculator, _next_version_check
+    calculator = _calculator
+    if calculator is not None and time.monotonic() < _next_version_check:
+        return calculator
+
+    with _calculator_lock:
+        if _calculator is None or time.monotonic() >= _next_version_check:
+            _next_version_check = time.monotonic() + getattr(settings, 'IMPACT_MODEL_RELOAD_INTERVAL', 5)
+            try:
+                version = model_store.current_version(model_root())
+            except model_store.BundleError as e:
+                if _calculator is None:
+                    raise ImpactModelUnavailable(f"{e}. Run 'manage.py train_impact_models' first.")
+                # Keep serving the loaded models if the pointer is briefly unreadable
+                version = _calculator.version
+            if _calculator is None or _calculator.version != version:
+                try:
+                    _calculator = ImpactCalculator(version)
+                except ImpactModelUnavailable:
+                    if _calculator is None:
+                        raise
+                    # A broken new version must not take down the one already serving
+                    logger.exception("Could not load impact model version %s; keeping version %s",
+                                     version, _calculator.version)
+                    metrics.increment('impact.model.load_failures')
+        return _calculator
+
 
 class ImpactCalculator:
-    def __init__(self):
-        self.model_carbon = RandomForestRegressor(n_estimators=100, max_depth=5, min_samples_split=5, random_state=42)
-        self.model_energy = RandomForestRegressor(n_estimators=100, max_depth=5, min_samples_split=5, random_state=42)
-        self.model_water = RandomForestRegressor(n_estimators=100, max_depth=5, min_samples_split=5, random_state=42)
-        self.scaler = StandardScaler()
-        self.label_encoder_location = LabelEncoder()
-        self.label_encoder_technology = LabelEncoder()
-
-        self.model_file_carbon = os.path.join(settings.BASE_DIR, 'investments/models/carbon_model.pkl')
-        self.model_file_energy = os.path.join(settings.BASE_DIR, 'investments/models/energy_model.pkl')
-        self.model_file_water = os.path.join(settings.BASE_DIR, 'investments/models/water_model.pkl')
-        self.scaler_file = os.path.join(settings.BASE_DIR, 'investments/models/scaler.pkl')
-
-        self.categories = [
-            'Renewable Energy', 'Recycling', 'Emission Control', 'Water Conservation',
-            'Reforestation', 'Sustainable Agriculture', 'Clean Transportation',
-            'Waste Management', 'Green Technology', 'Ocean Conservation'
-        ]
+    def __init__(self, version=None):
+        self.schema = get_feature_schema()
+        self.rules = compile_rules(self.schema.categories, self.schema.locations, self.schema.technologies)
 
-        self.label_encoder_location.fit([
-            'Andhra Pradesh', 'Arunachal Pradesh', 'Assam', 'Bihar', 'Chhattisgarh', 'Goa', 'Gujarat', 'Haryana',
-            'Himachal Pradesh', 'Jharkhand', 'Karnataka', 'Kerala', 'Madhya Pradesh', 'Maharashtra', 'Manipur',
-            'Meghalaya', 'Mizoram', 'Nagaland', 'Odisha', 'Punjab', 'Rajasthan', 'Sikkim', 'Tamil Nadu',
-            'Telangana', 'Tripura', 'Uttar Pradesh', 'Uttarakhand', 'West Bengal'
-        ])
-        self.label_encoder_technology.fit(['Solar', 'Wind', 'Hydro', 'Organic', 'Mechanical', 'Chemical', 'Biofuel', 'EV', 'Manual', 'AI'])
+        self.load_model(version)
+        self._frozen = True
 
-        self.load_or_train_model()
+    def __setattr__(self, name, value):
+        # Instances are shared across threads once loaded, so block mutation
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f"ImpactCalculator is read-only once loaded (tried to set '{name}')")
+        super().__setattr__(name, value)
 
-    def load_or_train_model(self):
+    def load_model(self, version=None):
+        """Open the memory-mapped bundle of a trained model version.
+
+        Defaults to the version named by the CURRENT pointer. Models are only
+        ever trained offline by the train_impact_models command.
+        """
+        root = model_root()
+        started = time.perf_counter()
         try:
-            # Check if all necessary files exist
-            if all(os.path.exists(f) for f in [self.model_file_carbon, self.model_file_energy, self.model_file_water, self.scaler_file]):
-                print("Loading pre-trained models and scaler...")
-                with open(self.model_file_carbon, 'rb') as f:
-                    self.model_carbon = pickle.load(f)
-                with open(self.model_file_energy, 'rb') as f:
-                    self.model_energy = pickle.load(f)
-                with open(self.model_file_water, 'rb') as f:
-                    self.model_water = pickle.load(f)
-                with open(self.scaler_file, 'rb') as f:
-                    self.scaler = pickle.load(f)
-                print("Models and scaler loaded successfully.")
-            else:
-                print("One or more model/scaler files missing. Training new models...")
-                self.train_model()
-        except Exception as e:
-            print(f"Failed to load models or scaler: {e}. Training new models...")
-            self.train_model()
-
-    def train_model(self):
-        # Create a more diverse training dataset with varied locations, categories, scales and technologies
-        X = np.array([
-            # Renewable Energy - Solar (high energy savings, moderate carbon reduction, minimal water impact)
-            [500000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 12, 5, 0, 0],    # Solar large-scale in Rajasthan
-            [100000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 12, 3, 0, 0],    # Solar medium-scale in Rajasthan  
-            [10000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 6, 1, 0, 0],      # Solar small-scale in Rajasthan
-            
-            # Renewable Energy - Wind (high energy savings, good carbon reduction, zero water impact)
-            [750000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 18, 7, 1, 1],    # Wind large-scale in Gujarat
-            [70000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 12, 4, 1, 1],     # Wind medium-scale in Gujarat
-            [5000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 6, 2, 1, 1],       # Wind small-scale in Gujarat
-            
-            # Recycling - Mechanical (moderate carbon reduction, low energy savings, moderate water savings)
-            [200000, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 12, 4, 13, 4],   # Recycling large-scale in Maharashtra
-            [50000, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 12, 3, 13, 4],    # Recycling medium-scale in Maharashtra
-            [5000, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 6, 2, 13, 4],      # Recycling small-scale in Maharashtra
-            
-            # Emission Control - Chemical (very high carbon reduction, low energy impact, low water impact)
-            [300000, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 12, 5, 25, 5],   # Emission control large-scale in UP
-            [75000, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 12, 3, 25, 5],    # Emission control medium-scale in UP
-            [3000, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 6, 2, 25, 5],      # Emission control small-scale in UP
-            
-            # Water Conservation (low carbon, minimal energy, extremely high water savings)
-            [250000, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 12, 4, 16, 2],   # Water conservation large-scale in Rajasthan
-            [25000, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 12, 2, 16, 2],    # Water conservation medium-scale in Rajasthan
-            [4000, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 6, 1, 16, 2],      # Water conservation small-scale in Rajasthan
-            
-            # Reforestation (highest carbon reduction, zero energy impact, good water conservation)
-            [150000, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 24, 5, 3, 3],    # Reforestation large-scale in Assam
-            [75000, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 18, 4, 3, 3],     # Reforestation medium-scale in Assam
-            [15000, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 12, 3, 3, 3],     # Reforestation small-scale in Assam
-            
-            # Clean Transportation - EV (high carbon reduction, high energy savings, minimal water impact)
-            [800000, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 18, 7, 13, 7],   # Clean transport large-scale in Maharashtra
-            [80000, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 12, 5, 13, 7],    # Clean transport medium-scale in Maharashtra
-            [8000, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 6, 2, 13, 7],      # Clean transport small-scale in Maharashtra
-            
-            # Waste Management (good carbon, moderate energy recovery, low water impact)
-            [600000, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 12, 6, 25, 4],   # Waste management large-scale in UP
-            [60000, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 12, 4, 25, 4],    # Waste management medium-scale in UP
-            [6000, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 6, 2, 25, 4],      # Waste management small-scale in UP
-            
-            # Green Technology (moderate across all metrics)
-            [700000, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 18, 7, 10, 9],   # Green tech large-scale in Karnataka
-            [70000, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 12, 5, 10, 9],    # Green tech medium-scale in Karnataka
-            [7000, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 6, 3, 10, 9],      # Green tech small-scale in Karnataka
-            
-            # Ocean Conservation (moderate carbon, low energy, extremely high water impact)
-            [350000, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 24, 6, 9, 2],    # Ocean conservation large-scale in Kerala
-            [35000, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 18, 4, 9, 2],     # Ocean conservation medium-scale in Kerala
-            [3500, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 12, 2, 9, 2],      # Ocean conservation small-scale in Kerala
-        ])
-
-        # Create impact values with category-specific focus
-        # Format: carbon (kg), energy (kWh), water (L) - per ₹1,000 investment
-        y_carbon = np.array([
-            750, 500, 150,      # Solar (by scale)
-            700, 450, 120,      # Wind (by scale)
-            300, 200, 80,       # Recycling (by scale)
-            900, 650, 250,      # Emission Control (by scale) - highest carbon reduction
-            100, 50, 20,        # Water Conservation (by scale)
-            950, 600, 300,      # Reforestation (by scale) - highest carbon reduction
-            800, 500, 150,      # Clean Transportation (by scale)
-            500, 300, 100,      # Waste Management (by scale)
-            400, 250, 80,       # Green Technology (by scale)
-            250, 150, 50,       # Ocean Conservation (by scale)
-        ])
-        
-        y_energy = np.array([
-            1000, 600, 200,     # Solar (by scale) - highest energy savings
-            900, 500, 150,      # Wind (by scale) - high energy savings
-            100, 70, 30,        # Recycling (by scale)
-            150, 90, 30,        # Emission Control (by scale)
-            30, 20, 0,          # Water Conservation (by scale) - can be zero
-            0, 0, 0,            # Reforestation (by scale) - zero energy impact
-            750, 450, 120,      # Clean Transportation (by scale) - high energy savings
-            400, 250, 80,       # Waste Management (by scale)
-            350, 200, 60,       # Green Technology (by scale)
-            50, 30, 0,          # Ocean Conservation (by scale) - can be zero
-        ])
-        
-        y_water = np.array([
-            50, 30, 0,          # Solar (by scale) - can be zero water impact
-            0, 0, 0,            # Wind (by scale) - zero water impact
-            200, 150, 50,       # Recycling (by scale)
-            300, 150, 50,       # Emission Control (by scale) - REDUCED water impact
-            3000, 2000, 1000,   # Water Conservation (by scale) - GREATLY INCREASED water savings
-            500, 350, 200,      # Reforestation (by scale) - good water savings
-            20, 15, 0,          # Clean Transportation (by scale) - can be zero
-            150, 100, 30,       # Waste Management (by scale)
-            250, 150, 50,       # Green Technology (by scale)
-            2500, 1800, 800,    # Ocean Conservation (by scale) - highest water savings
-        ])
-
-        # Add interaction term to the training data
-        interaction_term = X[:, 0] * X[:, 11]  # investment_amount * project_duration_months
-        X = np.hstack((X, interaction_term.reshape(-1, 1)))  # Add interaction term as a new feature
-
-        # Normalize the investment amounts and interaction term in the training data
-        X[:, 0] = np.log1p(X[:, 0])  # Apply log transformation to scale down large values
-        X[:, -1] = np.log1p(X[:, -1])  # Apply log transformation to the interaction term
-
-        # Fit the scaler on the normalized training data
-        self.scaler.fit(X)
-        X_transformed = self.scaler.transform(X)
-
-        self.model_carbon.fit(X_transformed, y_carbon)
-        self.model_energy.fit(X_transformed, y_energy)
-        self.model_water.fit(X_transformed, y_water)
-
-        print("Feature importance (carbon model):", self.model_carbon.feature_importances_)
-        print("Feature importance (energy model):", self.model_energy.feature_importances_)
-        print("Feature importance (water model):", self.model_water.feature_importances_)
-
-        os.makedirs(os.path.dirname(self.model_file_carbon), exist_ok=True)
-        with open(self.model_file_carbon, 'wb') as f:
-            pickle.dump(self.model_carbon, f)
-        with open(self.model_file_energy, 'wb') as f:
-            pickle.dump(self.model_energy, f)
-        with open(self.model_file_water, 'wb') as f:
-            pickle.dump(self.model_water, f)
-        with open(self.scaler_file, 'wb') as f:
-            pickle.dump(self.scaler, f)
-
-    def predict_impact(self, investment_amount, category_names, project_duration_months=12, project_scale=1, location='North India', technology_type='Manual'):
-        investment_amount = float(investment_amount)
-        mapped_location = location if location in self.label_encoder_location.classes_ else 'Uttar Pradesh'
-        location_encoded = self.label_encoder_location.transform([mapped_location])[0]
-        mapped_tech = technology_type if technology_type in self.label_encoder_technology.classes_ else 'Manual'
-        technology_encoded = self.label_encoder_technology.transform([mapped_tech])[0]
-
-        category_vector = [1 if cat in category_names else 0 for cat in self.categories]
-        
-        # Correctly find the primary category index by matching with category_names
-        primary_category_index = -1
-        for i, cat in enumerate(self.categories):
-            if cat in category_names:
-                primary_category_index = i
-                break
-                
-        print(f"Category names: {category_names}")
-        print(f"Category vector: {category_vector}")
-        print(f"Selected primary category: {self.categories[primary_category_index] if primary_category_index >= 0 else 'None'}")
-        print(f"Primary index: {primary_category_index}")
+            version = version or model_store.current_version(root)
+            manifest, forest, scaler_mean, scaler_scale = model_store.load_bundle(model_store.version_path(root, version))
+        except model_store.BundleError as e:
+            raise ImpactModelUnavailable(f"{e}. Run 'manage.py train_impact_models' first.")
+        columns = tuple(manifest.get('feature_columns', self.schema.columns))
+        if manifest['n_features'] != self.schema.n_features or columns != self.schema.columns:
+            raise ImpactModelUnavailable(f"Model {version} was trained on a different feature layout")
+
+        load_ms = (time.perf_counter() - started) * 1000
+        metrics.increment('impact.model.loads')
+        metrics.observe('impact.model.load_ms', load_ms)
+        logger.info("Loaded impact model version %s in %.1f ms", version, load_ms)
+        self.forest = forest
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.version = manifest['version']
+
+    def predict_impact(self, investment_amount, category_names, project_duration_months=12, project_scale=1, location='North India', technology_type='Manual', variation=None):
+        impact = self.predict_impact_batch(
+            [investment_amount],
+            [category_names],
+            project_duration_months=[project_duration_months],
+            project_scale=[project_scale],
+            location=[location],
+            technology_type=[technology_type],
+            variation=variation
+        )[0]
+
+        logger.debug("Impact for %s: %s", category_names, impact)
+
+        return impact
+
+    def variation_mode(self, mode=None):
+        mode = mode or getattr(settings, 'IMPACT_VARIATION_MODE', 'deterministic')
+        if mode not in VARIATION_MODES:
+            raise ImproperlyConfigured(
+                f"IMPACT_VARIATION_MODE must be one of {', '.join(VARIATION_MODES)}, got '{mode}'"
+            )
+        return mode
+
+    def variation_factors(self, n_rows, mode, row_keys=None):
+        """Return an (N, 3) array of ±5% multipliers for carbon, energy and water.
+
+        'deterministic' derives the factors from a hash of each row key and
+        IMPACT_VARIATION_SEED, so the same inputs always give the same numbers.
+        'random' is the legacy behaviour and 'none' disables variation.
+        """
+        if mode == 'none':
+            return np.ones((n_rows, 3))
+        if mode == 'random':
+            return 1.0 + (np.random.random((n_rows, 3)) - 0.5) * 0.1
+
+        seed = str(getattr(settings, 'IMPACT_VARIATION_SEED', 0)).encode()
+        digests = b''.join(
+            hashlib.blake2b(repr(key).encode(), digest_size=24, key=seed).digest()
+            for key in row_keys
+        )
+        uniform = np.frombuffer(digests, dtype='<u8').reshape(n_rows, 3) / 2.0 ** 64
+        return 1.0 + (uniform - 0.5) * 0.1
+
+    def predict_impact_batch(self, investment_amounts, category_names, project_duration_months=12, project_scale=1, location='North India', technology_type='Manual', variation=None):
+        """Predict impacts for N rows at once.
+
+        category_names is a list with one list of names per row. Every other argument
+        is either a sequence of length N or a scalar shared by all rows. variation
+        overrides IMPACT_VARIATION_MODE for this call. Returns a list of N dicts in
+        the same format as predict_impact.
+        """
+        n_rows = len(category_names)
+        if n_rows == 0:
+            return []
+
+        with metrics.timer('impact.predict_ms'):
+            amounts = np.broadcast_to(np.asarray(investment_amounts, dtype=float), (n_rows,))
+            rows = self._encode_rows(category_names, project_duration_months, project_scale, location, technology_type)
+
+            # Category-specific rules take priority over model predictions
+            impacts, has_rule = self._rule_impacts(rows)
+
+            # Fallback to model predictions only for rows without a category rule
+            fallback = ~has_rule
+            if fallback.any():
+                impacts[fallback] = self._model_impacts(rows, amounts, fallback)
+
+            self._count_rows(has_rule)
+            return self._finalize(
+                impacts, rows['rule_category'], rows['category_names'], amounts, rows['durations'],
+                rows['scales'], rows['locations'], rows['technologies'], variation
+            )
+
+    def impact_profiles(self, category_names, project_duration_months=12, project_scale=1, location='North India', technology_type='Manual'):
+        """Return the amount-independent part of the prediction for each row.
+
+        Rows matched by a category rule carry their pre-variation impacts in 'base',
+        so predict_from_profiles() can answer any amount in O(1). Rows that need the
+        model keep only their normalized inputs. Profiles are plain dicts and safe to
+        store in the Django cache.
+        """
+        if len(category_names) == 0:
+            return []
+
+        rows = self._encode_rows(category_names, project_duration_months, project_scale, location, technology_type)
+        impacts, has_rule = self._rule_impacts(rows)
+        return [
+            {
+                'rule_based': bool(rule_based),
+                'base': base.tolist() if rule_based else None,
+                'rule_category': int(rule_category),
+                'category_names': sorted(names),
+                'project_duration_months': float(duration),
+                'project_scale': float(scale),
+                'location': str(loc),
+                'technology_type': str(tech),
+            }
+            for base, rule_based, rule_category, names, duration, scale, loc, tech in zip(
+                impacts, has_rule, rows['rule_category'], rows['category_names'], rows['durations'],
+                rows['scales'], rows['locations'], rows['technologies']
+            )
+        ]
+
+    def predict_from_profiles(self, profiles, investment_amounts, variation=None):
+        """Predict impacts for profiles returned by impact_profiles()"""
+        n_rows = len(profiles)
+        if n_rows == 0:
+            return []
+
+        with metrics.timer('impact.predict_ms'):
+            amounts = np.broadcast_to(np.asarray(investment_amounts, dtype=float), (n_rows,))
+            has_rule = np.array([profile['rule_based'] for profile in profiles])
+            impacts = np.zeros((n_rows, 3))
+            if has_rule.any():
+                impacts[has_rule] = [profile['base'] for profile in profiles if profile['rule_based']]
+
+            fallback = ~has_rule
+            if fallback.any():
+                model_profiles = [profile for profile in profiles if not profile['rule_based']]
+                rows = self._encode_rows(
+                    [profile['category_names'] for profile in model_profiles],
+                    [profile['project_duration_months'] for profile in model_profiles],
+                    [profile['project_scale'] for profile in model_profiles],
+                    [profile['location'] for profile in model_profiles],
+                    [profile['technology_type'] for profile in model_profiles]
+                )
+                impacts[fallback] = self._model_impacts(rows, amounts[fallback], np.ones(len(model_profiles), dtype=bool))
+
+            self._count_rows(has_rule)
+            return self._finalize(
+                impacts,
+                np.array([profile['rule_category'] for profile in profiles]),
+                [profile['category_names'] for profile in profiles],
+                amounts,
+                [profile['project_duration_months'] for profile in profiles],
+                [profile['project_scale'] for profile in profiles],
+                [profile['location'] for profile in profiles],
+                [profile['technology_type'] for profile in profiles],
+                variation
+            )
+
+    def _count_rows(self, has_rule):
+        n_rule = int(np.count_nonzero(has_rule))
+        metrics.increment('impact.predictions', len(has_rule))
+        metrics.increment('impact.rule_path', n_rule)
+        metrics.increment('impact.model_path', len(has_rule) - n_rule)
+
+    def _encode_rows(self, category_names, project_duration_months, project_scale, location, technology_type):
+        n_rows = len(category_names)
+        durations = np.broadcast_to(np.asarray(project_duration_months, dtype=float), (n_rows,))
+        scales = np.broadcast_to(np.asarray(project_scale, dtype=float), (n_rows,))
+        locations = np.broadcast_to(np.asarray(location, dtype=object), (n_rows,))
+        technologies = np.broadcast_to(np.asarray(technology_type, dtype=object), (n_rows,))
+
+        location_codes = self.schema.encode_locations(locations)
+        technology_codes = self.schema.encode_technologies(technologies)
+        category_matrix = self.schema.category_matrix(category_names)
+
+        # The primary category is the first schema category present in the row;
+        # rows without one use the trailing "no category" entry of the rule tables
+        rule_category = np.where(category_matrix.any(axis=1), category_matrix.argmax(axis=1), len(self.schema.categories))
 
         # Duration scaling factor - normalized to 12-month baseline
-        if project_duration_months <= 12:
-            duration_factor = project_duration_months / 12.0
-        else:
-            duration_factor = 1.0 + (np.sqrt(project_duration_months / 12.0) - 1.0) * 0.5
-        
+        duration_factor = np.where(
+            durations <= 12,
+            durations / 12.0,
+            1.0 + (np.sqrt(durations / 12.0) - 1.0) * 0.5
+        )
+
         # Scale factor based on project scale (1-10) with diminishing returns for larger scales
-        scale_factor = 0.3 + 0.7 * (project_scale ** 0.4)  # Using power of 0.4 for less aggressive scaling
-        
-        # Calculate realistic base metrics by category - ADJUSTED TO MORE CONSERVATIVE ANNUAL VALUES
-        # These are reference values per ₹1,000 for a 12-month, scale=1 project
-        renewable_energy_base = {
-            'carbon': 45,   # kg CO₂ 
-            'energy': 50,   # kWh
-            'water': 0,     # L
-        }
-        
-        emission_control_base = {
-            'carbon': 350,   # kg CO₂
-            'energy': 80,    # kWh
-            'water': 100,    # L
-        }
-        
-        water_conservation_base = {
-            'carbon': 80,    # kg CO₂
-            'energy': 30,    # kWh
-            'water': 1500,   # L
-        }
-        
-        recycling_base = {
-            'carbon': 200,   # kg CO₂
-            'energy': 120,   # kWh
-            'water': 200,    # L
-        }
-        
-        reforestation_base = {
-            'carbon': 500,   # kg CO₂
-            'energy': 0,     # kWh
-            'water': 1000,   # L
-        }
-        
-        clean_transportation_base = {
-            'carbon': 300,   # kg CO₂
-            'energy': 250,   # kWh
-            'water': 0,      # L
-        }
-        
-        ocean_conservation_base = {
-            'carbon': 150,   # kg CO₂
-            'energy': 0,     # kWh
-            'water': 1200,   # L
-        }
-        
-        waste_management_base = {
-            'carbon': 220,   # kg CO₂
-            'energy': 180,   # kWh
-            'water': 100,    # L
-        }
-        
-        green_technology_base = {
-            'carbon': 150,   # kg CO₂
-            'energy': 220,   # kWh
-            'water': 50,     # L
+        scale_factor = 0.3 + 0.7 * (scales ** 0.4)  # Using power of 0.4 for less aggressive scaling
+
+        return {
+            'category_names': category_names,
+            'category_matrix': category_matrix,
+            'rule_category': rule_category,
+            'durations': durations,
+            'scales': scales,
+            'locations': self.schema.location_names[location_codes],
+            'technologies': self.schema.technology_names[technology_codes],
+            'location_codes': location_codes,
+            'technology_codes': technology_codes,
+            'factor': scale_factor * duration_factor,
         }
 
-        # Prepare model input data for fallback case
-        interaction_term = investment_amount * project_duration_months
-        X = np.array([[investment_amount, interaction_term] + category_vector + [project_duration_months, project_scale, location_encoded, technology_encoded]])
-        
-        X_transformed = X.copy()
-        X_transformed[:, 0] = np.log1p(X[:, 0])
-        X_transformed[:, 1] = np.log1p(X[:, 1])
-        X_transformed = self.scaler.transform(X_transformed)
-
-        # Category-specific logic takes priority over model predictions
-        if primary_category_index == 4:  # Reforestation (corrected from 5)
-            carbon_reduced = reforestation_base['carbon'] * scale_factor * duration_factor
-            energy_saved = 0  # Enforce zero energy impact for reforestation
-            water_conserved = 1000 * scale_factor * duration_factor  # Hardcode base 1000 L
-            
-            # Apply location-based water boost directly for more control
-            if mapped_location in ["Assam", "Kerala", "Meghalaya", "West Bengal", "Nagaland"]:  # Added Nagaland
-                water_conserved *= 1.2  # High rainfall regions boost
-                
-        elif primary_category_index == 0:  # Renewable Energy
-            tech_multiplier = 1.15 if "Solar" in mapped_tech else (0.9 if "Wind" in mapped_tech else 0.8)
-            carbon_reduced = renewable_energy_base['carbon'] * scale_factor * duration_factor * tech_multiplier
-            energy_saved = renewable_energy_base['energy'] * scale_factor * duration_factor * tech_multiplier
-            water_conserved = 0  # Zero water impact for renewable energy
-            
-            # For larger renewable projects, apply more modest boost
-            if project_scale >= 5:
-                energy_saved *= 1.2
-                
-        elif primary_category_index == 2:  # Emission Control
-            carbon_reduced = emission_control_base['carbon'] * scale_factor * duration_factor
-            energy_saved = emission_control_base['energy'] * scale_factor * duration_factor
-            water_conserved = emission_control_base['water'] * scale_factor * duration_factor
-            
-            # For large emission control projects, use fixed value as recommended
-            if project_scale >= 4:
-                carbon_reduced = 1500  # Fixed value as recommended
-            
-        elif primary_category_index == 3:  # Water Conservation
-            carbon_reduced = water_conservation_base['carbon'] * scale_factor * duration_factor
-            energy_saved = water_conservation_base['energy'] * scale_factor * duration_factor
-            water_conserved = water_conservation_base['water'] * scale_factor * duration_factor
-            
-            # Location-based boost for high-rainfall regions
-            if mapped_location in ["Assam", "Kerala", "Meghalaya"]:
-                water_conserved *= 1.15
-            
-        elif primary_category_index == 1:  # Recycling
-            carbon_reduced = recycling_base['carbon'] * scale_factor * duration_factor
-            energy_saved = recycling_base['energy'] * scale_factor * duration_factor
-            water_conserved = recycling_base['water'] * scale_factor * duration_factor
-            
-        elif primary_category_index == 6:  # Clean Transportation
-            carbon_reduced = clean_transportation_base['carbon'] * scale_factor * duration_factor
-            energy_saved = clean_transportation_base['energy'] * scale_factor * duration_factor
-            water_conserved = 0  # Zero water impact for clean transportation
-            
-        elif primary_category_index == 9:  # Ocean Conservation
-            carbon_reduced = ocean_conservation_base['carbon'] * scale_factor * duration_factor
-            energy_saved = 0  # Zero energy impact for ocean conservation
-            water_conserved = ocean_conservation_base['water'] * scale_factor * duration_factor
-            
-        elif primary_category_index == 7:  # Waste Management
-            carbon_reduced = waste_management_base['carbon'] * scale_factor * duration_factor
-            energy_saved = waste_management_base['energy'] * scale_factor * duration_factor
-            water_conserved = waste_management_base['water'] * scale_factor * duration_factor
-            
-        elif primary_category_index == 8:  # Green Technology
-            carbon_reduced = green_technology_base['carbon'] * scale_factor * duration_factor
-            energy_saved = green_technology_base['energy'] * scale_factor * duration_factor
-            water_conserved = green_technology_base['water'] * scale_factor * duration_factor
-            
-            if "AI" in technology_type:
-                water_conserved = 0  # Zero water impact for AI-based green tech
-        else:
-            # Fallback to model predictions only if no category is matched
-            carbon_reduced = max(0, self.model_carbon.predict(X_transformed)[0])
-            energy_saved = max(0, self.model_energy.predict(X_transformed)[0])
-            water_conserved = max(0, self.model_water.predict(X_transformed)[0])
-            print("Using model fallback for predictions")
-
-        # Location-specific adjustments
-        if mapped_location in ["Rajasthan", "Gujarat"] and primary_category_index == 0:
-            # Higher solar efficiency in these regions
-            energy_saved *= 1.1
-            
-        # Add small random variation (±5%) to avoid identical values for similar projects
-        variation_factor = 1.0 + (np.random.random() - 0.5) * 0.1
-        carbon_reduced *= variation_factor
-        energy_saved *= 1.0 + (np.random.random() - 0.5) * 0.1
-        water_conserved *= 1.0 + (np.random.random() - 0.5) * 0.1
-        
-        # Final guarantee that energy is zero for specific categories
-        if primary_category_index in [5, 9]:  # Reforestation or Ocean Conservation
-            energy_saved = 0
-            
+    def _rule_impacts(self, rows):
+        return self.rules.apply(
+            rows['rule_category'], rows['factor'],
+            rows['location_codes'], rows['technology_codes'], rows['scales']
+        )
+
+    def _model_impacts(self, rows, amounts, mask):
+        X = self.schema.build_matrix(
+            amounts[mask], rows['category_matrix'][mask], rows['durations'][mask], rows['scales'][mask],
+            rows['location_codes'][mask], rows['technology_codes'][mask]
+        )
+        X_transformed = (self.schema.normalize(X) - self.scaler_mean) / self.scaler_scale
+
+        # Carbon, energy and water forests evaluated together in one traversal
+        with metrics.timer('impact.forest_ms'):
+            return np.maximum(0, self.forest.predict(X_transformed))
+
+    def _finalize(self, impacts, rule_category, category_names, amounts, durations, scales, locations, technologies, variation):
+        n_rows = len(impacts)
+
+        # Add small variation (±5%) to avoid identical values for similar projects
+        mode = self.variation_mode(variation)
+        row_keys = None
+        if mode == 'deterministic':
+            row_keys = [
+                (sorted(names), round(float(amount), 2), float(duration), float(scale), str(loc), str(tech))
+                for names, amount, duration, scale, loc, tech
+                in zip(category_names, amounts, durations, scales, locations, technologies)
+            ]
+        impacts = impacts * self.variation_factors(n_rows, mode, row_keys)
+
+        # Final guarantee that some metrics are zero for specific categories
+        impacts[self.rules.zero_after_variation[rule_category]] = 0
+
         # Ensure values can't go below zero after variation
-        carbon_reduced = max(0, carbon_reduced)
-        energy_saved = max(0, energy_saved)
-        water_conserved = max(0, water_conserved)
-        
-        # Log impact calculation details
-        print(f"Category: {category_names}, Primary Index: {primary_category_index}")
-        print(f"Scale Factor: {scale_factor}, Duration Factor: {duration_factor}")
-        print(f"Final Impact - Carbon: {carbon_reduced}, Energy: {energy_saved}, Water: {water_conserved}")
-        
-        # Return the final impact metrics
-        return {
-            "carbon": round(carbon_reduced, 2),
-            "energy": round(energy_saved, 2),
-            "water": round(water_conserved, 2)
-        }
\ No newline at end of file
+        impacts = np.maximum(0, impacts).round(2)
+
+        return [
+            {"carbon": float(carbon), "energy": float(energy), "water": float(water)}
+            for carbon, energy, water in impacts
+        ]
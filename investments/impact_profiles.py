@@ -0,0 +1,90 @@
+"""Cached per-initiative impact profiles.
+
+A profile is the amount-independent part of an initiative's impact prediction
+(see ImpactCalculator.impact_profiles). Profiles live in the Django cache under
+the initiative id, stamped with the initiative's updated_at and the model
+version so stale entries are recomputed, and are dropped by the signal handlers
+in investments.signals whenever an initiative or its categories change.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from investments.instrumentation import metrics
+
+
+def get_impact_calculator():
+    """Return the shared ImpactCalculator, importing NumPy and the models on first use.
+
+    Modules loaded at startup (models, signals, views) go through this instead
+    of importing investments.impact_calculator, so manage.py commands that never
+    predict do not pay for the import.
+    """
+    from investments import impact_calculator
+    return impact_calculator.get_impact_calculator()
+
+
+def profile_cache_key(initiative_id):
+    return f'impact-profile:{initiative_id}'
+
+
+def _profile_stamp(initiative, model_version):
+    if not initiative.pk or not initiative.updated_at:
+        return None
+    return (initiative.updated_at.isoformat(), model_version)
+
+
+def get_impact_profiles(initiatives):
+    """Return one impact profile per initiative, computing cache misses in one batch"""
+    calculator = get_impact_calculator()
+    initiatives = list(initiatives)
+    stamps = [_profile_stamp(initiative, calculator.version) for initiative in initiatives]
+
+    cached = cache.get_many([profile_cache_key(initiative.pk) for initiative, stamp in zip(initiatives, stamps) if stamp])
+    profiles = []
+    missing = []
+    for initiative, stamp in zip(initiatives, stamps):
+        entry = cached.get(profile_cache_key(initiative.pk)) if stamp else None
+        if entry is not None and entry['stamp'] == stamp:
+            profiles.append(entry['profile'])
+        else:
+            profiles.append(None)
+            missing.append(len(profiles) - 1)
+
+    metrics.increment('impact.profile_cache.hits', len(profiles) - len(missing))
+    metrics.increment('impact.profile_cache.misses', len(missing))
+    if missing:
+        missing_initiatives = [initiatives[index] for index in missing]
+        prefetch_related_objects([i for i in missing_initiatives if i.pk], 'categories')
+        computed = calculator.impact_profiles(
+            [[category.name for category in initiative.categories.all()] if initiative.pk else [] for initiative in missing_initiatives],
+            project_duration_months=[initiative.duration_months for initiative in missing_initiatives],
+            project_scale=[initiative.project_scale for initiative in missing_initiatives],
+            location=[initiative.location for initiative in missing_initiatives],
+            technology_type=[initiative.technology_type for initiative in missing_initiatives]
+        )
+        to_cache = {}
+        for index, profile in zip(missing, computed):
+            profiles[index] = profile
+            if stamps[index]:
+                to_cache[profile_cache_key(initiatives[index].pk)] = {'stamp': stamps[index], 'profile': profile}
+        if to_cache:
+            cache.set_many(to_cache, getattr(settings, 'IMPACT_PROFILE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+    return profiles
+
+
+def get_impact_profile(initiative):
+    return get_impact_profiles([initiative])[0]
+
+
+def predict_for_initiatives(initiatives, investment_amounts, variation=None):
+    """Predict impacts for initiatives from their cached profiles.
+
+    investment_amounts may be one amount for every initiative or one per initiative.
+    """
+    profiles = get_impact_profiles(initiatives)
+    return get_impact_calculator().predict_from_profiles(profiles, investment_amounts, variation)
+
+
+def invalidate_impact_profiles(initiative_ids):
+    cache.delete_many([profile_cache_key(initiative_id) for initiative_id in initiative_ids])
@@ -0,0 +1,160 @@
+"""Coefficient table behind the category rules of ImpactCalculator.
+
+Rules are written as plain data so they can be audited and edited without
+touching the prediction code. compile_rules() turns them into NumPy lookup
+tables once, and CompiledRules.apply() evaluates a whole batch with a few
+gathers and multiplies.
+"""
+import numpy as np
+
+METRICS = ('carbon', 'energy', 'water')
+
+# Largest project scale with its own entry in the compiled scale tables;
+# larger scales share the last entry
+MAX_SCALE = 10
+
+# Base impact per ₹1,000 for a 12-month, scale=1 project as (carbon kg CO₂, energy kWh, water L).
+# Categories mapped to None have no rule and fall back to the model predictions.
+CATEGORY_BASE = {
+    'Renewable Energy': (45, 50, 0),
+    'Recycling': (200, 120, 200),
+    'Emission Control': (350, 80, 100),
+    'Water Conservation': (80, 30, 1500),
+    'Reforestation': (500, 0, 1000),
+    'Sustainable Agriculture': None,
+    'Clean Transportation': (300, 250, 0),
+    'Waste Management': (220, 180, 100),
+    'Green Technology': (150, 220, 50),
+    'Ocean Conservation': (150, 0, 1200),
+}
+
+# (category, locations, metrics, multiplier)
+LOCATION_MULTIPLIERS = [
+    # High rainfall regions boost water savings
+    ('Reforestation', ('Assam', 'Kerala', 'Meghalaya', 'West Bengal', 'Nagaland'), ('water',), 1.2),
+    ('Water Conservation', ('Assam', 'Kerala', 'Meghalaya'), ('water',), 1.15),
+    # Higher solar efficiency in these regions
+    ('Renewable Energy', ('Rajasthan', 'Gujarat'), ('energy',), 1.1),
+]
+
+# (category, technologies, metrics, multiplier); technologies=None matches every
+# technology and later entries replace earlier ones for the same cells
+TECHNOLOGY_MULTIPLIERS = [
+    ('Renewable Energy', None, ('carbon', 'energy'), 0.8),
+    ('Renewable Energy', ('Solar',), ('carbon', 'energy'), 1.15),
+    ('Renewable Energy', ('Wind',), ('carbon', 'energy'), 0.9),
+    # Zero water impact for AI-based green tech
+    ('Green Technology', ('AI',), ('water',), 0.0),
+]
+
+# (category, minimum project scale, metrics, multiplier)
+SCALE_MULTIPLIERS = [
+    # Modest boost for larger renewable projects
+    ('Renewable Energy', 5, ('energy',), 1.2),
+]
+
+# (category, minimum project scale, metric, fixed value) replacing the rule result
+OVERRIDES = [
+    # Large emission control projects use a fixed value as recommended
+    ('Emission Control', 4, 'carbon', 1500),
+]
+
+# (category, metric) forced to zero after variation, whichever path produced the value
+ZERO_METRICS = [
+    ('Sustainable Agriculture', 'energy'),
+    ('Ocean Conservation', 'energy'),
+]
+
+
+class CompiledRules:
+    """Rule table compiled into arrays indexed by category, location, technology and scale.
+
+    Category arrays have one extra trailing row used for rows without any known
+    category, so the primary category index -1 can be gathered like any other.
+    """
+
+    def __init__(self, has_rule, base, location_multiplier, technology_multiplier,
+                 scale_multiplier, override, zero_after_variation):
+        self.has_rule = has_rule
+        self.base = base
+        self.location_multiplier = location_multiplier
+        self.technology_multiplier = technology_multiplier
+        self.scale_multiplier = scale_multiplier
+        self.override = override
+        self.zero_after_variation = zero_after_variation
+
+    def scale_index(self, scales):
+        return np.clip(np.asarray(scales, dtype=float), 0, MAX_SCALE).astype(int)
+
+    def apply(self, primary_category_index, factor, location_codes, technology_codes, scales):
+        """Return (impacts, has_rule) for a batch; impacts is an (N, 3) array.
+
+        Rows where has_rule is False carry zeros and need the model fallback.
+        """
+        category = np.asarray(primary_category_index)
+        scale = self.scale_index(scales)
+
+        impacts = (
+            self.base[category]
+            * np.asarray(factor)[:, None]
+            * self.location_multiplier[category, location_codes]
+            * self.technology_multiplier[category, technology_codes]
+            * self.scale_multiplier[category, scale]
+        )
+        override = self.override[category, scale]
+        impacts = np.where(np.isnan(override), impacts, override)
+        return impacts, self.has_rule[category]
+
+
+def compile_rules(categories, locations, technologies):
+    """Compile the rule tables for the given category, location and technology orderings"""
+    categories = list(categories)
+    locations = list(locations)
+    technologies = list(technologies)
+    n_categories = len(categories) + 1  # trailing row for "no category"
+    n_metrics = len(METRICS)
+
+    category_index = {name: i for i, name in enumerate(categories)}
+    location_index = {name: i for i, name in enumerate(locations)}
+    technology_index = {name: i for i, name in enumerate(technologies)}
+    metric_index = {name: i for i, name in enumerate(METRICS)}
+
+    has_rule = np.zeros(n_categories, dtype=bool)
+    base = np.zeros((n_categories, n_metrics))
+    for name, values in CATEGORY_BASE.items():
+        if values is not None and name in category_index:
+            has_rule[category_index[name]] = True
+            base[category_index[name]] = values
+
+    location_multiplier = np.ones((n_categories, len(locations), n_metrics))
+    for name, names, metrics, multiplier in LOCATION_MULTIPLIERS:
+        rows = [location_index[loc] for loc in names if loc in location_index]
+        for metric in metrics:
+            location_multiplier[category_index[name], rows, metric_index[metric]] = multiplier
+
+    technology_multiplier = np.ones((n_categories, len(technologies), n_metrics))
+    for name, names, metrics, multiplier in TECHNOLOGY_MULTIPLIERS:
+        if names is None:
+            rows = list(range(len(technologies)))
+        else:
+            rows = [technology_index[tech] for tech in names if tech in technology_index]
+        for metric in metrics:
+            technology_multiplier[category_index[name], rows, metric_index[metric]] = multiplier
+
+    scale_multiplier = np.ones((n_categories, MAX_SCALE + 1, n_metrics))
+    for name, min_scale, metrics, multiplier in SCALE_MULTIPLIERS:
+        for metric in metrics:
+            scale_multiplier[category_index[name], min_scale:, metric_index[metric]] *= multiplier
+
+    override = np.full((n_categories, MAX_SCALE + 1, n_metrics), np.nan)
+    for name, min_scale, metric, value in OVERRIDES:
+        override[category_index[name], min_scale:, metric_index[metric]] = value
+
+    zero_after_variation = np.zeros((n_categories, n_metrics), dtype=bool)
+    for name, metric in ZERO_METRICS:
+        zero_after_variation[category_index[name], metric_index[metric]] = True
+
+    return CompiledRules(
+        has_rule, base, location_multiplier, technology_multiplier,
+        scale_multiplier, override, zero_after_variation
+    )
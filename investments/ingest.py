@@ -0,0 +1,182 @@
+"""Bulk creation of investments from imported rows.
+
+ingest_investments() checks each row the way invest_initiative does (the
+initiative's min_investment, max_investment and remaining amount), predicts
+every accepted row's impact in one batch, bulk_creates the investments and
+then applies one funding update per initiative and one totals update per
+user. The import_investments command feeds it CSV or JSON Lines files.
+
+A row names its investor by user_id, username or email, its initiative by
+initiative_id, and has an amount plus an optional ISO created_at for
+backfilled history.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from initiatives.models import Initiative
+from investments.bulk import update_rows
+from investments.impact_profiles import get_impact_calculator, get_impact_profiles
+from investments.models import Investment
+from investments.portfolio_cache import invalidate_portfolio_summaries
+from users.models import Profile
+
+USER_KEYS = ['user_id', 'username', 'email']
+
+
+def parse_row(row):
+    """Return (user key, user value, initiative id, amount, created_at) or raise ValueError"""
+    user_key = next((key for key in USER_KEYS if str(row.get(key) or '').strip()), None)
+    if user_key is None:
+        raise ValueError('No user_id, username or email')
+    user_value = str(row[user_key]).strip()
+
+    try:
+        initiative_id = int(row.get('initiative_id'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid initiative_id {row.get('initiative_id')!r}")
+    if user_key == 'user_id':
+        try:
+            user_value = int(user_value)
+        except ValueError:
+            raise ValueError(f'Invalid user_id {user_value!r}')
+
+    try:
+        amount = Decimal(str(row.get('amount')).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount {row.get('amount')!r}")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError(f'Amount must be positive, got {amount}')
+
+    created_at = None
+    if row.get('created_at'):
+        created_at = parse_datetime(str(row['created_at']))
+        if created_at is None:
+            raise ValueError(f"Invalid created_at {row['created_at']!r}")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, datetime.timezone.utc)
+    return user_key, user_value, initiative_id, amount, created_at
+
+
+def find_users(parsed):
+    """{(user key, value): user} for every investor named in the parsed rows"""
+    wanted = defaultdict(set)
+    for user_key, user_value, *_ in parsed:
+        wanted[user_key].add(user_value)
+    query = Q(pk__in=wanted['user_id']) | Q(username__in=wanted['username']) | Q(email__in=wanted['email'])
+
+    users = {}
+    for user in get_user_model().objects.filter(query):
+        users['user_id', user.pk] = user
+        users['username', user.username] = user
+        users['email', user.email] = user
+    return users
+
+
+def ingest_investments(rows, first_row=1, dry_run=False, room=None):
+    """Create investments for the valid rows in one transaction.
+
+    Rows are checked in order, so each sees the room left by the rows before
+    it. Returns {'created': [investments], 'rejected': [(row number, reason)]}.
+    With dry_run nothing is predicted or written; 'created' then holds the
+    unsaved investments that would be created. room is an optional
+    {initiative id: remaining amount} dict carried between calls, so dry runs
+    of later chunks see what earlier chunks used; initiatives missing from it
+    are read from the database and accepted rows are taken off it.
+    """
+    rejected = []
+    parsed = []
+    for number, row in enumerate(rows, first_row):
+        try:
+            parsed.append((number, parse_row(row)))
+        except ValueError as e:
+            rejected.append((number, str(e)))
+
+    users = find_users([values for _, values in parsed])
+    initiatives = Initiative.objects.in_bulk({values[2] for _, values in parsed})
+    if room is None:
+        room = {}
+    for pk, initiative in initiatives.items():
+        room.setdefault(pk, initiative.goal_amount - initiative.current_amount)
+
+    accepted = []
+    for number, (user_key, user_value, initiative_id, amount, created_at) in parsed:
+        user = users.get((user_key, user_value))
+        initiative = initiatives.get(initiative_id)
+        if user is None:
+            reason = f'Unknown {user_key} {user_value!r}'
+        elif initiative is None:
+            reason = f'Unknown initiative {initiative_id}'
+        elif initiative.status == 'funded' or room[initiative_id] <= 0:
+            reason = f'Initiative {initiative_id} is already fully funded'
+        elif amount < initiative.min_investment:
+            reason = f'Minimum investment amount is ₹{initiative.min_investment:,}'
+        elif initiative.max_investment and amount > initiative.max_investment:
+            reason = f'Maximum investment amount is ₹{initiative.max_investment:,}'
+        elif amount > room[initiative_id]:
+            reason = f'Initiative {initiative_id} only needs ₹{room[initiative_id]:,} more to be fully funded'
+        else:
+            room[initiative_id] -= amount
+            investment = Investment(user=user, initiative=initiative, amount=amount)
+            accepted.append((number, investment, created_at))
+            continue
+        rejected.append((number, reason))
+
+    if dry_run or not accepted:
+        return {'created': [investment for _, investment, _ in accepted], 'rejected': sorted(rejected)}
+
+    # One profile per initiative and one prediction call for every row
+    calculator = get_impact_calculator()
+    used = {investment.initiative_id: investment.initiative for _, investment, _ in accepted}
+    profiles = dict(zip(used, get_impact_profiles(used.values())))
+    impacts = calculator.predict_from_profiles(
+        [profiles[investment.initiative_id] for _, investment, _ in accepted],
+        [float(investment.amount) for _, investment, _ in accepted]
+    )
+    for (_, investment, _), impact in zip(accepted, impacts):
+        investment.set_impact(impact)
+
+    with transaction.atomic():
+        funding = defaultdict(Decimal)
+        for _, investment, _ in accepted:
+            funding[investment.initiative_id] += investment.amount
+        # In id order, so concurrent imports take the row locks in the same order
+        refused = set(Initiative.add_funding_many({pk: funding[pk] for pk in sorted(funding)}))
+        if refused:
+            # Funded by someone else since the rows were checked
+            rejected.extend(
+                (number, f'Initiative {investment.initiative_id} no longer has room for this investment')
+                for number, investment, _ in accepted if investment.initiative_id in refused
+            )
+            accepted = [entry for entry in accepted if entry[1].initiative_id not in refused]
+
+        created = Investment.objects.bulk_create([investment for _, investment, _ in accepted], batch_size=1000)
+        # bulk_create() stamps auto_now_add fields, so backdate historical rows afterwards
+        backdated = []
+        for _, investment, created_at in accepted:
+            if created_at is not None:
+                investment.created_at = created_at
+                backdated.append(investment)
+        if backdated:
+            update_rows(Investment, backdated, ['created_at'])
+
+        totals = defaultdict(lambda: [Decimal('0'), 0, 0.0, 0.0, 0.0])
+        for investment in created:
+            user_totals = totals[investment.user_id]
+            user_totals[0] += investment.amount
+            user_totals[1] += 1
+            user_totals[2] += investment.carbon_impact
+            user_totals[3] += investment.energy_impact
+            user_totals[4] += investment.water_impact
+        for user_id in sorted(totals):
+            Profile.add_investment_totals(user_id, *totals[user_id])
+        # bulk_create() sends no post_save signals
+        invalidate_portfolio_summaries(totals)
+
+    return {'created': created, 'rejected': sorted(rejected)}
@@ -0,0 +1,106 @@
+"""Logging and in-process metrics for impact prediction.
+
+Prediction code logs to the 'investments.impact' logger with %-style arguments,
+so debug records cost nothing unless that level is enabled. Counters and
+latency histograms are kept per worker process in memory and exposed as JSON by
+the staff-only impact_metrics view.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('investments.impact')
+
+# Upper bounds in milliseconds of the latency histogram buckets; the last bucket is open
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are reported as bucket upper bounds"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+            'buckets': {
+                **{f'le_{bound}': count for bound, count in zip(self.bounds, self.counts)},
+                'inf': self.counts[-1],
+            },
+        }
+
+
+class Metrics:
+    """Thread-safe named counters and histograms for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._started = time.time()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, value, bounds=LATENCY_BUCKETS_MS):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(bounds)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name):
+        """Record the duration of the block in milliseconds under name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'since': self._started,
+                'counters': dict(sorted(self._counters.items())),
+                'histograms': {name: histogram.as_dict() for name, histogram in sorted(self._histograms.items())},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.time()
+
+
+metrics = Metrics()
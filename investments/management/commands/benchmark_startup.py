@@ -0,0 +1,91 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Code run in a fresh interpreter for each scenario; prints its own wall time
+SCENARIOS = {
+    'setup': 'django.setup()',
+    'urls': 'django.setup(); from django.urls import get_resolver; get_resolver().url_patterns',
+    'warmup': (
+        'django.setup(); from django.urls import get_resolver; get_resolver().url_patterns; '
+        'from investments.impact_profiles import get_impact_calculator; get_impact_calculator()'
+    ),
+}
+SCRIPT = 'import time; t = time.perf_counter(); import django; {code}; print(time.perf_counter() - t)'
+HEAVY_PACKAGES = ('numpy', 'sklearn', 'scipy', 'joblib', 'pandas')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Measures Django startup in fresh interpreters and reports import time per app'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            choices=sorted(SCENARIOS),
+            action='append',
+            help='Startup scenario to measure (default: all)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; the median is reported')
+        parser.add_argument('--top', type=int, default=10, help='Third-party packages to list per scenario')
+
+    def handle(self, *args, **options):
+        # Apps that live in this project, plus the project package holding the settings
+        base_dir = os.fspath(settings.BASE_DIR)
+        project_apps = sorted(
+            {config.name.split('.')[0] for config in apps.get_app_configs() if config.path.startswith(base_dir)}
+            | {settings.SETTINGS_MODULE.split('.')[0]}
+        )
+
+        for name in options['scenario'] or SCENARIOS:
+            runs = [self.run_scenario(SCENARIOS[name]) for _ in range(options['repeat'])]
+            wall = statistics.median(wall for wall, _ in runs)
+            # Per-package self time of the run closest to the median
+            packages = min(runs, key=lambda run: abs(run[0] - wall))[1]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {wall * 1000:.0f} ms (median of {len(runs)})"))
+            self.stdout.write("  Project apps:")
+            for package in project_apps:
+                self.stdout.write(f"    {package:<20} {packages.get(package, 0) / 1000:8.1f} ms")
+
+            heavy = [package for package in HEAVY_PACKAGES if package in packages]
+            if heavy:
+                self.stdout.write(self.style.WARNING(
+                    "  Heavy packages imported: " + ', '.join(
+                        f"{package} ({packages[package] / 1000:.0f} ms)" for package in heavy
+                    )
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS("  No heavy packages imported"))
+
+            others = sorted(
+                (item for item in packages.items() if item[0] not in project_apps),
+                key=lambda item: item[1], reverse=True
+            )
+            self.stdout.write("  Top other packages:")
+            for package, micros in others[:options['top']]:
+                self.stdout.write(f"    {package:<20} {micros / 1000:8.1f} ms")
+
+    def run_scenario(self, code):
+        """Return (wall seconds, {top-level package: self import time in µs})"""
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(code=code)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            raise CommandError(f"Startup scenario failed:\n{result.stderr[-2000:]}")
+
+        packages = defaultdict(int)
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                packages[match.group(4).split('.')[0]] += int(match.group(1))
+        return float(result.stdout.strip().splitlines()[-1]), packages
@@ -0,0 +1,83 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from investments.ingest import ingest_investments
+
+
+def read_rows(path, file_format):
+    """Yield the rows of a CSV (with a header) or JSON Lines file as dicts"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                raise CommandError(f'{path}:{line_number}: invalid JSON: {e}')
+            if not isinstance(row, dict):
+                raise CommandError(f'{path}:{line_number}: expected a JSON object')
+            yield row
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports investments in bulk from CSV or JSON Lines rows of user_id/username/email, '
+        'initiative_id, amount and an optional created_at'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a .jsonl file with one object per line')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: from the extension)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows validated and written per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the rows without creating investments')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"No such file '{path}'")
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        dry_run = options['dry_run']
+
+        started = time.perf_counter()
+        total = created = 0
+        rejected = []
+        # A dry run writes nothing, so later chunks learn what earlier ones used from here
+        room = {} if dry_run else None
+        chunk = []
+        for row in read_rows(path, file_format):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                created += self.import_chunk(chunk, total + 1, dry_run, rejected, room)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            created += self.import_chunk(chunk, total + 1, dry_run, rejected, room)
+            total += len(chunk)
+
+        elapsed = time.perf_counter() - started
+        for number, reason in rejected[:50]:
+            self.stdout.write(self.style.WARNING(f"  row {number}: {reason}"))
+        if len(rejected) > 50:
+            self.stdout.write(self.style.WARNING(f"  ... and {len(rejected) - 50} more"))
+
+        summary = f"{created} of {total} rows ({len(rejected)} rejected) in {elapsed:.2f}s"
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Dry run would import {summary}. No changes were made."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {summary}."))
+
+    def import_chunk(self, rows, first_row, dry_run, rejected, room):
+        result = ingest_investments(rows, first_row=first_row, dry_run=dry_run, room=room)
+        rejected.extend(result['rejected'])
+        self.stdout.write(f"  {first_row + len(rows) - 1} rows read, {len(result['created'])} accepted in this chunk")
+        return len(result['created'])
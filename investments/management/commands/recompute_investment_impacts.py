@@ -0,0 +1,150 @@
+import json
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from investments.bulk import update_rows
+from investments.impact_profiles import get_impact_calculator, get_impact_profiles
+from investments.models import Investment
+from investments.portfolio_cache import invalidate_portfolio_summaries
+from users.models import Profile
+
+DEFAULT_CHECKPOINT = os.path.join(settings.BASE_DIR, 'recompute_investment_impacts.checkpoint.json')
+
+
+def recompute_chunk(investments, calculator):
+    """Set fresh impacts on a chunk of investments.
+
+    Returns how many changed and {user_id: [carbon, energy, water]} changes to
+    the users' impact totals.
+    """
+    # One profile per distinct initiative; categories are prefetched for cache misses only
+    initiatives = {investment.initiative_id: investment.initiative for investment in investments}
+    profiles = dict(zip(initiatives, get_impact_profiles(initiatives.values())))
+    impacts = calculator.predict_from_profiles(
+        [profiles[investment.initiative_id] for investment in investments],
+        [float(investment.amount) for investment in investments]
+    )
+
+    changed = 0
+    deltas = defaultdict(lambda: [0.0, 0.0, 0.0])
+    for investment, impact in zip(investments, impacts):
+        old_values = [getattr(investment, name) for name in Investment.IMPACT_FIELDS]
+        new_values = [impact['carbon'], impact['energy'], impact['water'], calculator.version]
+        if old_values != new_values:
+            changed += 1
+            user_deltas = deltas[investment.user_id]
+            for i in range(3):
+                user_deltas[i] += new_values[i] - old_values[i]
+        for name, value in zip(Investment.IMPACT_FIELDS, new_values):
+            setattr(investment, name, value)
+    return changed, deltas
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored impacts of every investment with the current impact model, resumably'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Investments predicted and written per batch')
+        parser.add_argument(
+            '--checkpoint',
+            default=DEFAULT_CHECKPOINT,
+            help='File recording the last finished primary key, used to resume an interrupted run',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the beginning')
+        parser.add_argument('--dry-run', action='store_true', help='Compute the impacts without saving them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        dry_run = options['dry_run']
+        checkpoint_path = options['checkpoint']
+
+        calculator = get_impact_calculator()
+        checkpoint = self.start_checkpoint(checkpoint_path, calculator.version, options['restart'] or dry_run)
+        last_pk = checkpoint['last_pk']
+
+        queryset = (
+            Investment.objects.order_by('pk')
+            .select_related('initiative')
+            .only('pk', 'user', 'amount', *Investment.IMPACT_FIELDS,
+                  'initiative__duration_months', 'initiative__project_scale', 'initiative__location',
+                  'initiative__technology_type', 'initiative__updated_at')
+        )
+        remaining = queryset.filter(pk__gt=last_pk).count()
+        self.stdout.write(
+            f"Recomputing impacts of {remaining} investments with model {calculator.version}"
+            + (f", resuming after pk {last_pk}" if last_pk else '')
+        )
+
+        started = time.perf_counter()
+        processed = changed = 0
+        while True:
+            investments = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not investments:
+                break
+
+            chunk_changed, deltas = recompute_chunk(investments, calculator)
+            changed += chunk_changed
+            if not dry_run:
+                # Keep the users' profile totals in step with the rewritten impacts
+                with transaction.atomic():
+                    update_rows(Investment, investments, Investment.IMPACT_FIELDS)
+                    for user_id, (carbon, energy, water) in deltas.items():
+                        Profile.add_investment_totals(user_id, carbon=carbon, energy=energy, water=water)
+                    invalidate_portfolio_summaries(deltas)
+
+            last_pk = investments[-1].pk
+            processed += len(investments)
+            if not dry_run:
+                checkpoint.update(last_pk=last_pk, processed=checkpoint['processed'] + len(investments))
+                self.save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - started
+            rate = processed / elapsed if elapsed else 0
+            eta = (remaining - processed) / rate if rate else 0
+            self.stdout.write(f"  {processed}/{remaining} ({rate:,.0f}/s, about {eta:.0f}s left)")
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0
+        summary = f"{processed} investments ({changed} with new impacts) in {elapsed:.2f}s, {rate:,.0f}/s"
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Dry run completed for {summary}. No changes were made."))
+            return
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {summary}."))
+
+    def start_checkpoint(self, path, model_version, restart):
+        """Load a checkpoint for this model version, or start a fresh one"""
+        if not restart and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    checkpoint = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Unreadable checkpoint '{path}': {e}. Use --restart to start over.")
+            if checkpoint.get('model_version') == model_version:
+                return checkpoint
+            self.stdout.write(self.style.WARNING(
+                f"Checkpoint is for model {checkpoint.get('model_version')}; starting over for {model_version}"
+            ))
+        return {
+            'model_version': model_version,
+            'last_pk': 0,
+            'processed': 0,
+            'started_at': timezone.now().isoformat(),
+        }
+
+    def save_checkpoint(self, path, checkpoint):
+        # Written after each chunk is committed, and replaced atomically
+        staging = f'{path}.tmp'
+        with open(staging, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(staging, path)
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from initiatives.models import Category, Initiative
+from investments.stress import check_funding, hammer
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress-tests concurrent investments against a throwaway file-backed SQLite test database '
+        'and reports throughput, latency and the funding invariants'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent investors')
+        parser.add_argument('--requests', type=int, default=25, help='Investment POSTs per thread')
+        parser.add_argument('--initiatives', type=int, default=20, help='Initiatives in the spread scenario')
+        parser.add_argument('--amount', default='1000', help='Amount of each investment')
+        parser.add_argument(
+            '--scenario',
+            choices=['hot', 'spread'],
+            action='append',
+            help="'hot' sends every request to one initiative that fills up halfway through, "
+                 "'spread' shares them over many (default: both)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('stress_invest creates its own SQLite test database; use it with SQLite settings')
+        amount = Decimal(options['amount'])
+        threads = options['threads']
+        total_requests = threads * options['requests']
+
+        # A file-backed test database, so every thread's connection sees the same data
+        test_dir = tempfile.mkdtemp(prefix='stress-invest-')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(test_dir, 'db.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        failed = False
+        try:
+            users = self.create_users(threads)
+            for scenario in options['scenario'] or ['hot', 'spread']:
+                if scenario == 'hot':
+                    # Room for half the requests, so the funded transition is contended too
+                    ids = self.create_initiatives(1, amount * (total_requests // 2))
+                else:
+                    ids = self.create_initiatives(options['initiatives'], amount * total_requests)
+                result = hammer(ids, users, threads, options['requests'], amount)
+                problems = check_funding(ids)
+                self.report(scenario, len(ids), result, problems)
+                failed = failed or bool(problems or result['failed'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+        if failed:
+            raise CommandError('Investments failed or the funding invariants were violated')
+
+    def create_users(self, count):
+        User = get_user_model()
+        return [
+            User.objects.create_user(username=f'stress{n}', email=f'stress{n}@example.com', password=None)
+            for n in range(count)
+        ]
+
+    def create_initiatives(self, count, goal_amount):
+        category, _ = Category.objects.get_or_create(name='Renewable Energy')
+        ids = []
+        for n in range(count):
+            initiative = Initiative.objects.create(
+                title=f'Stress initiative {Initiative.objects.count() + 1}',
+                description='Created by stress_invest',
+                status='active',
+                goal_amount=goal_amount,
+                min_investment=Decimal('1'),
+            )
+            initiative.categories.add(category)
+            ids.append(initiative.pk)
+        return ids
+
+    def report(self, scenario, n_initiatives, result, problems):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{scenario}: {result['threads']} threads, {result['requests']} requests, {n_initiatives} initiatives"
+        ))
+        self.stdout.write(
+            f"  invested: {result['invested']}  refused: {result['refused']}  failed: {result['failed']}"
+        )
+        self.stdout.write(
+            f"  {result['investments_per_second']:.1f} investments/s, {result['requests_per_second']:.1f} requests/s "
+            f"in {result['elapsed']:.2f}s"
+        )
+        if result['p50_ms'] is not None:
+            self.stdout.write(f"  latency p50: {result['p50_ms']:.1f} ms  p99: {result['p99_ms']:.1f} ms")
+        for error in result['errors'][:5]:
+            self.stdout.write(self.style.ERROR(f"  {error}"))
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"  {problem}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("  Funding invariants hold"))
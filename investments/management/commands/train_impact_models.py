@@ -0,0 +1,143 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from investments import model_store, training
+from investments.features import get_feature_schema
+from investments.forest import CompiledForest
+from investments.impact_calculator import model_root
+
+class Command(BaseCommand):
+    help = 'Trains and evaluates the impact models, writes a new model version and activates it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n-estimators', type=int, default=100, help='Trees per forest')
+        parser.add_argument('--max-depth', type=int, default=5, help='Maximum tree depth')
+        parser.add_argument('--seed', type=int, default=42, help='Random state for training and evaluation')
+        parser.add_argument(
+            '--multi-output',
+            action='store_true',
+            help='Train one forest predicting all targets instead of one forest per target',
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Report accuracy, training time and model size of the per-target and multi-output forests',
+        )
+        parser.add_argument(
+            '--min-r2',
+            type=float,
+            default=None,
+            help='Refuse to activate the new version if any target scores below this cross-validated R²',
+        )
+        parser.add_argument(
+            '--no-activate',
+            action='store_true',
+            help='Write the new version without pointing CURRENT at it',
+        )
+        parser.add_argument(
+            '--from-pickles',
+            action='store_true',
+            help='Import the legacy pickled models as a version instead of training',
+        )
+        parser.add_argument(
+            '--activate',
+            metavar='VERSION',
+            help='Only point CURRENT at an existing version (e.g. to roll back)',
+        )
+        parser.add_argument('--list', action='store_true', help='List stored versions and exit')
+
+    def handle(self, *args, **options):
+        root = model_root()
+
+        if options['list']:
+            return self.list_versions(root)
+
+        if options['activate']:
+            return self.activate(root, options['activate'])
+
+        if options['from_pickles']:
+            forests, scaler = training.load_legacy_models()
+            metadata = {'source': 'pickle'}
+        else:
+            params = {
+                'n_estimators': options['n_estimators'],
+                'max_depth': options['max_depth'],
+                'multi_output': options['multi_output'],
+            }
+            X, y = training.training_data()
+
+            if options['compare']:
+                self.compare(X, y, options['seed'], params)
+
+            self.stdout.write(f"Evaluating on {len(X)} samples with 5-fold cross-validation...")
+            evaluation = training.evaluate_models(X, y, random_state=options['seed'], **params)
+            for target, scores in evaluation.items():
+                self.stdout.write(f"  {target:<7} MAE: {scores['mae']:10.2f}  R²: {scores['r2']:6.3f}")
+
+            self.stdout.write("Training on the full dataset...")
+            forests, scaler = training.fit_models(X, y, random_state=options['seed'], **params)
+            metadata = {'source': 'training', 'params': dict(params, seed=options['seed']), 'evaluation': evaluation}
+
+            if options['min_r2'] is not None and min(s['r2'] for s in evaluation.values()) < options['min_r2']:
+                options['no_activate'] = True
+                self.stdout.write(self.style.WARNING(
+                    f"Cross-validated R² is below {options['min_r2']}; the new version will not be activated"
+                ))
+
+        metadata['feature_columns'] = list(get_feature_schema().columns)
+        forest = CompiledForest.from_forests(forests)
+        manifest = model_store.save_version(root, forest, scaler.mean_, scaler.scale_, metadata=metadata)
+        self.stdout.write(f"Wrote model version {manifest['version']} ({len(forest.roots)} trees)")
+
+        if not options['no_activate']:
+            self.activate(root, manifest['version'])
+
+    def compare(self, X, y, seed, params):
+        """Cross-validate and time both model layouts on the same folds"""
+        self.stdout.write(f"Comparing per-target and multi-output forests on {len(X)} samples...")
+        results = {}
+        for multi_output in (False, True):
+            layout_params = dict(params, multi_output=multi_output)
+            evaluation = training.evaluate_models(X, y, random_state=seed, **layout_params)
+
+            started = time.perf_counter()
+            forests, scaler = training.fit_models(X, y, random_state=seed, **layout_params)
+            fit_seconds = time.perf_counter() - started
+
+            forest = CompiledForest.from_forests(forests)
+            X_transformed = scaler.transform(get_feature_schema().normalize(X))
+            started = time.perf_counter()
+            for _ in range(100):
+                forest.predict(X_transformed[:1])
+            predict_ms = (time.perf_counter() - started) * 10
+
+            results[multi_output] = evaluation
+            layout = 'multi-output' if multi_output else 'per-target'
+            self.stdout.write(
+                f"  {layout:<12}  fit: {fit_seconds:6.2f}s  trees: {len(forest.roots):4d}  "
+                f"nodes: {len(forest.feature):6d}  predict(1 row): {predict_ms:.3f}ms"
+            )
+            for target, scores in evaluation.items():
+                self.stdout.write(f"    {target:<7} MAE: {scores['mae']:10.2f}  R²: {scores['r2']:6.3f}")
+
+        for target in training.TARGETS:
+            delta = results[True][target]['r2'] - results[False][target]['r2']
+            self.stdout.write(f"  {target:<7} R² change with multi-output: {delta:+.3f}")
+
+    def activate(self, root, version):
+        try:
+            model_store.activate_version(root, version)
+        except model_store.BundleError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Activated model version {version}; workers pick it up within the reload interval"
+        ))
+
+    def list_versions(self, root):
+        try:
+            current = model_store.current_version(root)
+        except model_store.BundleError:
+            current = None
+        for manifest in model_store.list_versions(root):
+            marker = '*' if manifest['version'] == current else ' '
+            self.stdout.write(f"{marker} {manifest['version']}  {manifest['created_at']}  {manifest.get('source', '')}")
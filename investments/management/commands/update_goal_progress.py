@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from investments.bulk import update_rows
+from investments.goal_progress import goal_progress
+from investments.models import InvestmentGoal
+
+
+class Command(BaseCommand):
+    help = "Stores the current progress of every investment goal on the goal, for reporting"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users whose goals are evaluated and written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Compute the progress without saving it')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        dry_run = options['dry_run']
+
+        user_ids = list(InvestmentGoal.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+        self.stdout.write(f"Updating goal progress for {len(user_ids)} users...")
+
+        started = time.perf_counter()
+        evaluated = 0
+        for start in range(0, len(user_ids), chunk_size):
+            # Every goal of a chunk of users shares one set of portfolio snapshots
+            goals = list(InvestmentGoal.objects.filter(user_id__in=user_ids[start:start + chunk_size]).order_by('pk'))
+            updated_at = timezone.now()
+            for goal, progress in zip(goals, goal_progress(goals)):
+                goal.progress = progress
+                goal.progress_updated_at = updated_at
+                if options['verbosity'] > 1 or dry_run:
+                    self.stdout.write(f"  goal {goal.pk} ({goal.goal_type}) of user {goal.user_id}: {float(progress or 0):.1f}%")
+            if not dry_run:
+                update_rows(InvestmentGoal, goals, ['progress', 'progress_updated_at'])
+            evaluated += len(goals)
+
+        elapsed = time.perf_counter() - started
+        summary = f"{evaluated} goals of {len(user_ids)} users in {elapsed:.2f}s"
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Dry run evaluated {summary}. No changes were made."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Updated {summary}."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0008_recalculate_impacts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='investment',
+            name='impact_model_version',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
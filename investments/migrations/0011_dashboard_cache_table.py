@@ -0,0 +1,45 @@
+from django.apps.registry import Apps
+from django.db import migrations, models
+
+# Table of the shared dashboard summary cache; CACHES['dashboard']['LOCATION']
+# in the settings must name it
+CACHE_TABLE = 'dashboard_cache'
+
+
+def cache_entry_model():
+    # The columns DatabaseCache reads and writes, as createcachetable lays them
+    # out, on a model outside the app registry so it is never part of the state
+    class Meta:
+        apps = Apps()
+        app_label = 'investments'
+        db_table = CACHE_TABLE
+
+    return type('DashboardCacheEntry', (models.Model,), {
+        '__module__': __name__,
+        'Meta': Meta,
+        'cache_key': models.CharField(max_length=255, unique=True, primary_key=True),
+        'value': models.TextField(),
+        'expires': models.DateTimeField(db_index=True),
+    })
+
+
+def create_cache_table(apps, schema_editor):
+    # Databases that ran 'manage.py createcachetable' already have it
+    if CACHE_TABLE not in schema_editor.connection.introspection.table_names():
+        schema_editor.create_model(cache_entry_model())
+
+
+def delete_cache_table(apps, schema_editor):
+    if CACHE_TABLE in schema_editor.connection.introspection.table_names():
+        schema_editor.delete_model(cache_entry_model())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('investments', '0010_investmentgoal_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, delete_cache_table),
+    ]
@@ -0,0 +1,228 @@
+"""Memory-mappable, versioned artifact bundles for the impact models.
+
+A bundle is a directory holding one raw .npy file per array plus a small
+manifest.json describing the format version, array dtypes and shapes, and the
+checksums of the files. Arrays are opened with mmap_mode='r', so every worker
+process serving the same bundle shares the same physical pages through the OS
+page cache instead of unpickling a private copy.
+
+Bundles live under <root>/versions/<version>/ and never change once written.
+<root>/CURRENT names the version the web workers serve; it is replaced
+atomically, so switching models is a single rename.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+from django.utils import timezone
+
+from investments.forest import CompiledForest
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+VERSIONS_DIR = 'versions'
+CURRENT_POINTER = 'CURRENT'
+
+# Fixed on-disk dtypes so bundles do not depend on the platform's intp
+FOREST_ARRAYS = {
+    'feature': np.int32,
+    'threshold': np.float64,
+    'left': np.int32,
+    'right': np.int32,
+    'value': np.float64,
+    'roots': np.int32,
+    'weights': np.float64,
+}
+SCALER_ARRAYS = {
+    'scaler_mean': np.float64,
+    'scaler_scale': np.float64,
+}
+
+
+class BundleError(Exception):
+    """Raised when a bundle is missing, incomplete or in an unknown format"""
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_bundle(staging, forest, scaler_mean, scaler_scale, metadata):
+    arrays = {name: np.ascontiguousarray(getattr(forest, name), dtype=dtype) for name, dtype in FOREST_ARRAYS.items()}
+    arrays['scaler_mean'] = np.ascontiguousarray(scaler_mean, dtype=SCALER_ARRAYS['scaler_mean'])
+    arrays['scaler_scale'] = np.ascontiguousarray(scaler_scale, dtype=SCALER_ARRAYS['scaler_scale'])
+
+    os.makedirs(staging)
+    entries = {}
+    for name, array in arrays.items():
+        filename = f'{name}.npy'
+        np.save(os.path.join(staging, filename), array, allow_pickle=False)
+        entries[name] = {
+            'file': filename,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'sha256': _file_digest(os.path.join(staging, filename)),
+        }
+
+    # The version is derived from the content so identical models share it
+    content_digest = hashlib.sha256(
+        ''.join(entries[name]['sha256'] for name in sorted(entries)).encode()
+    ).hexdigest()
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': content_digest[:12],
+        'created_at': timezone.now().isoformat(),
+        'max_depth': int(forest.max_depth),
+        'n_features': int(arrays['scaler_mean'].shape[0]),
+        'targets': ['carbon', 'energy', 'water'][:arrays['value'].shape[1]],
+        'arrays': entries,
+    }
+    manifest.update(metadata or {})
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def save_bundle(directory, forest, scaler_mean, scaler_scale, metadata=None, overwrite=False):
+    """Write a bundle to directory and return its manifest.
+
+    The files are written to a temporary sibling directory first and renamed
+    into place, so readers never see a half-written bundle.
+    """
+    directory = os.fspath(directory)
+    if os.path.exists(directory) and not overwrite:
+        raise BundleError(f"Bundle directory '{directory}' already exists")
+
+    staging = f'{directory}.tmp-{uuid.uuid4().hex[:8]}'
+    try:
+        manifest = _write_bundle(staging, forest, scaler_mean, scaler_scale, metadata)
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.replace(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def version_path(root, version):
+    return os.path.join(os.fspath(root), VERSIONS_DIR, version)
+
+
+def save_version(root, forest, scaler_mean, scaler_scale, metadata=None):
+    """Write a new immutable bundle under <root>/versions/ and return its manifest.
+
+    The CURRENT pointer is left alone; call activate_version() to serve it.
+    Saving models identical to an existing version reuses that version.
+    """
+    versions = os.path.join(os.fspath(root), VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    staging = os.path.join(versions, f'.staging-{uuid.uuid4().hex[:8]}')
+    try:
+        manifest = _write_bundle(staging, forest, scaler_mean, scaler_scale, metadata)
+        target = version_path(root, manifest['version'])
+        if os.path.exists(target):
+            shutil.rmtree(staging)
+            return read_manifest(target)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def list_versions(root):
+    """Return the manifests of all stored versions, oldest first"""
+    versions = os.path.join(os.fspath(root), VERSIONS_DIR)
+    if not os.path.isdir(versions):
+        return []
+    manifests = []
+    for name in os.listdir(versions):
+        if name.startswith('.'):
+            continue
+        try:
+            manifests.append(read_manifest(os.path.join(versions, name)))
+        except BundleError:
+            continue
+    return sorted(manifests, key=lambda manifest: manifest['created_at'])
+
+
+def current_version(root):
+    """Return the version named by <root>/CURRENT"""
+    try:
+        with open(os.path.join(os.fspath(root), CURRENT_POINTER)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        raise BundleError(f"No {CURRENT_POINTER} model pointer in '{root}'")
+    if not version:
+        raise BundleError(f"Empty {CURRENT_POINTER} model pointer in '{root}'")
+    return version
+
+
+def activate_version(root, version):
+    """Atomically point <root>/CURRENT at an existing, readable version"""
+    read_manifest(version_path(root, version))
+    pointer = os.path.join(os.fspath(root), CURRENT_POINTER)
+    staging = f'{pointer}.tmp-{uuid.uuid4().hex[:8]}'
+    with open(staging, 'w') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staging, pointer)
+
+
+def read_manifest(directory):
+    path = os.path.join(os.fspath(directory), MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise BundleError(f"No model bundle found at '{directory}'")
+    if manifest.get('format') != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')!r} in '{directory}'")
+    return manifest
+
+
+def load_bundle(directory, mmap=True, verify=False):
+    """Open a bundle and return (manifest, CompiledForest, scaler_mean, scaler_scale).
+
+    With mmap the arrays stay backed by the files; verify re-checks the file
+    checksums, which reads every page and is meant for offline validation.
+    """
+    directory = os.fspath(directory)
+    manifest = read_manifest(directory)
+
+    arrays = {}
+    for name in list(FOREST_ARRAYS) + list(SCALER_ARRAYS):
+        entry = manifest['arrays'].get(name)
+        if entry is None:
+            raise BundleError(f"Bundle '{directory}' is missing array '{name}'")
+        path = os.path.join(directory, entry['file'])
+        if verify and _file_digest(path) != entry['sha256']:
+            raise BundleError(f"Checksum mismatch for '{path}'")
+        try:
+            array = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise BundleError(f"Cannot read array '{name}' from '{path}': {e}")
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise BundleError(f"Array '{name}' in '{directory}' does not match the manifest")
+        arrays[name] = array
+
+    forest = CompiledForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        left=arrays['left'],
+        right=arrays['right'],
+        value=arrays['value'],
+        roots=arrays['roots'],
+        weights=arrays['weights'],
+        max_depth=manifest['max_depth'],
+    )
+    return manifest, forest, arrays['scaler_mean'], arrays['scaler_scale']
@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from initiatives.models import Initiative
-from django.db.models import Sum
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
-from investments.impact_calculator import ImpactCalculator
+from django.utils import timezone
+from investments.impact_profiles import predict_for_initiatives, get_impact_calculator
+from investments.portfolio_cache import invalidate_portfolio_summaries
+from users.models import Profile
 
 User = get_user_model()
 
@@ -19,44 +21,55 @@ class Investment(models.Model):
     carbon_impact = models.FloatField(default=0)  # CO2 reduction in kg
     energy_impact = models.FloatField(default=0)  # Energy saved in kWh
     water_impact = models.FloatField(default=0)   # Water saved in liters
+    impact_model_version = models.CharField(max_length=32, blank=True, default='')  # Model that produced the impacts
+
+    # Fields written when stored impacts are recomputed
+    IMPACT_FIELDS = ['carbon_impact', 'energy_impact', 'water_impact', 'impact_model_version']
+    # Fields counted in initiative funding and the users' profile totals
+    TOTALS_FIELDS = ['user_id', 'initiative_id', 'amount', 'carbon_impact', 'energy_impact', 'water_impact']
     
     def __str__(self):
         return f"{self.user.username}'s investment in {self.initiative.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored impacts belong to the loaded initiative and amount
+        if 'initiative_id' in field_names and 'amount' in field_names:
+            instance._impact_inputs = (instance.initiative_id, instance.amount)
+        return instance
+
+    @classmethod
+    def invest(cls, user, initiative, amount, impact=None):
+        """Create an investment, computing its impact once (or using a precomputed impact)"""
+        investment = cls(user=user, initiative=initiative, amount=amount)
+        investment.set_impact(impact)
+        investment.save()
+        return investment
+
     def calculate_impact(self):
         """Centralized impact calculation using AI model"""
-        calculator = ImpactCalculator()
-        categories = [cat.name for cat in self.initiative.categories.all()]
-        
-        # Get impact values as a dictionary
-        impact = calculator.predict_impact(
-            investment_amount=float(self.amount),
-            category_names=categories,
-            project_duration_months=self.initiative.duration_months,
-            project_scale=self.initiative.project_scale,
-            location=self.initiative.location,
-            technology_type=self.initiative.technology_type
-        )
-        
-        return impact
+        return Investment.calculate_impact_for_amount(self.initiative, self.amount)
+
+    def set_impact(self, impact=None):
+        """Store impact (computed now if not given) as the impact of the current initiative and amount"""
+        if impact is None:
+            impact = self.calculate_impact()
+        self.carbon_impact = float(impact['carbon'])
+        self.energy_impact = float(impact['energy'])
+        self.water_impact = float(impact['water'])
+        self.impact_model_version = get_impact_calculator().version
+        self._impact_inputs = (self.initiative_id, self.amount)
+
+    def impact_is_stale(self):
+        """Whether the initiative or amount changed since the impact was computed or loaded"""
+        return getattr(self, '_impact_inputs', None) != (self.initiative_id, self.amount)
     
     @staticmethod
     def calculate_impact_for_amount(initiative, amount):
         """Calculate environmental impact for a given investment amount"""
-        from .impact_calculator import ImpactCalculator
-        
-        calculator = ImpactCalculator()
-        category_names = [category.name for category in initiative.categories.all()]
-        
-        # Calculate impact metrics based on initiative details
-        impact = calculator.predict_impact(
-            investment_amount=amount,
-            category_names=category_names,
-            project_duration_months=initiative.duration_months,
-            project_scale=initiative.project_scale,
-            location=initiative.location,
-            technology_type=initiative.technology_type
-        )
+        # Answered from the initiative's cached impact profile
+        impact = predict_for_initiatives([initiative], float(amount))[0]
         
         # Only update stored metrics if we're in a "calculate and store" operation mode
         # For normal predictions, we always return the freshly calculated values
@@ -64,36 +77,98 @@ class Investment(models.Model):
             initiative.carbon_reduction_per_investment = impact['carbon']
             initiative.energy_savings_per_investment = impact['energy']
             initiative.water_savings_per_investment = impact['water']
-            initiative.save()
+            initiative.impact_model_version = get_impact_calculator().version
+            initiative.impact_computed_at = timezone.now()
+            # Leave updated_at alone so the initiative does not look changed again
+            initiative.save(update_fields=Initiative.IMPACT_METRIC_FIELDS)
         
         return impact
+
+    @staticmethod
+    def calculate_impact_for_initiatives(initiatives, amount):
+        """Calculate environmental impact of the same amount for many initiatives in one batch"""
+        return predict_for_initiatives(initiatives, float(amount))
     
     def save(self, *args, **kwargs):
-        # Calculate impacts using centralized method
-        impacts = self.calculate_impact()
-        self.carbon_impact = impacts['carbon']
-        self.energy_impact = impacts['energy']
-        self.water_impact = impacts['water']
-        
-        # Update initiative amount if new investment
-        if not self.pk:
-            # Calculate the new total amount after this investment
-            new_total_amount = self.initiative.current_amount + self.amount
-            self.initiative.current_amount = new_total_amount
-            
-            # Check if initiative is now fully funded (100% or more)
-            if new_total_amount >= self.initiative.goal_amount and self.initiative.status != 'funded':
-                self.initiative.status = 'funded'
-                
-            self.initiative.save()
-            
-        super().save(*args, **kwargs)
+        # Only predict when the impact inputs changed, e.g. not for admin edits of other fields
+        if self.impact_is_stale():
+            self.set_impact()
+
+        # Funding and profile totals commit or roll back together with the investment row
+        with transaction.atomic():
+            self.update_totals(kwargs.get('update_fields'))
+            super().save(*args, **kwargs)
+
+    def update_totals(self, update_fields=None):
+        """Apply this save's changes to the initiatives' funding and the users' profile totals"""
+        if self._state.adding:
+            self.initiative.add_funding(self.amount)
+            Profile.add_investment_totals(self.user_id, self.amount, 1,
+                                          self.carbon_impact, self.energy_impact, self.water_impact)
+            return
+        saved = None if update_fields is None else {
+            self._meta.get_field(name).attname for name in update_fields
+        }
+        if saved is not None and not saved & set(self.TOTALS_FIELDS):
+            return
+
+        # Lock the stored row so concurrent edits of the same investment apply their deltas in turn
+        old = dict(zip(
+            self.TOTALS_FIELDS,
+            Investment.objects.select_for_update().values_list(*self.TOTALS_FIELDS).get(pk=self.pk)
+        ))
+        # Fields left out of update_fields keep their stored values
+        new = {
+            name: getattr(self, name) if saved is None or name in saved else old[name]
+            for name in self.TOTALS_FIELDS
+        }
+
+        if old['initiative_id'] == new['initiative_id']:
+            if new['amount'] != old['amount']:
+                self.initiative_for(new['initiative_id']).add_funding(new['amount'] - old['amount'])
+        else:
+            Initiative.objects.get(pk=old['initiative_id']).add_funding(-old['amount'])
+            self.initiative_for(new['initiative_id']).add_funding(new['amount'])
+
+        if old['user_id'] == new['user_id']:
+            deltas = [new[name] - old[name] for name in self.TOTALS_FIELDS[2:]]
+            if any(deltas):
+                Profile.add_investment_totals(new['user_id'], deltas[0], 0, *deltas[1:])
+        else:
+            Profile.add_investment_totals(old['user_id'], -old['amount'], -1,
+                                          -old['carbon_impact'], -old['energy_impact'], -old['water_impact'])
+            # post_save only invalidates the new investor's dashboard
+            invalidate_portfolio_summaries([old['user_id']])
+            Profile.add_investment_totals(new['user_id'], new['amount'], 1,
+                                          new['carbon_impact'], new['energy_impact'], new['water_impact'])
+
+    def initiative_for(self, initiative_id):
+        """The loaded initiative when it is the one asked for, otherwise a fresh copy"""
+        if initiative_id == self.initiative_id:
+            return self.initiative
+        return Initiative.objects.get(pk=initiative_id)
     
     def delete(self, *args, **kwargs):
-        # Update initiative's current amount when investment is deleted
-        self.initiative.current_amount -= self.amount
-        self.initiative.save()
-        super().delete(*args, **kwargs)
+        with transaction.atomic():
+            # The post_delete handler takes the stored amount and impacts off the totals,
+            # not the ones on this instance, which may have been edited since loading
+            self._stored_totals = Investment.objects.select_for_update().values_list(*self.TOTALS_FIELDS).get(pk=self.pk)
+            result = super().delete(*args, **kwargs)
+        if Investment.initiative.is_cached(self):
+            self.initiative.refresh_from_db(fields=['current_amount', 'status'])
+        return result
+
+    def remove_from_totals(self):
+        """Take a deleted investment off its initiative's funding and its user's profile totals.
+
+        Runs from post_delete, so queryset deletes and cascades from initiatives and
+        users are counted too; the initiative or profile may be deleted along with it.
+        """
+        stored = getattr(self, '_stored_totals', None) or [getattr(self, name) for name in self.TOTALS_FIELDS]
+        user_id, initiative_id, amount, carbon, energy, water = stored
+        # Refuses nothing for a withdrawal; an initiative deleted in the same cascade simply has no row
+        Initiative.add_funding_many({initiative_id: -amount})
+        Profile.add_investment_totals(user_id, -amount, -1, -carbon, -energy, -water, create=False)
 
 class InvestmentGoal(models.Model):
     GOAL_TYPES = [
@@ -111,27 +186,28 @@ class InvestmentGoal(models.Model):
     target_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
     
+    progress = models.FloatField(null=True, blank=True)  # Materialized by update_goal_progress for reporting
+    progress_updated_at = models.DateTimeField(null=True, blank=True)
+    
     def get_progress(self):
+        from investments.goal_progress import goal_progress
+        return goal_progress([self])[0]
+
+    def progress_from(self, snapshot):
+        """Progress percentage of this goal given its user's portfolio snapshot (see investments.goal_progress)"""
         if self.goal_type == 'amount':
-            current = self.user.investments.aggregate(total=Sum('amount'))['total'] or 0
+            current = snapshot['total_invested']
             return float((current / self.target_amount * 100) if self.target_amount else 0)
         elif self.goal_type == 'impact':
-            profile = self.user.profile
-            if not profile:
-                return 0
             progress = {
-                'carbon': float((profile.carbon_reduced / self.target_carbon * 100) if self.target_carbon else 0),
-                'energy': float((profile.energy_saved / self.target_energy * 100) if self.target_energy else 0),
-                'water': float((profile.water_conserved / self.target_water * 100) if self.target_water else 0)
+                'carbon': float((snapshot['carbon_reduced'] / self.target_carbon * 100) if self.target_carbon else 0),
+                'energy': float((snapshot['energy_saved'] / self.target_energy * 100) if self.target_energy else 0),
+                'water': float((snapshot['water_conserved'] / self.target_water * 100) if self.target_water else 0)
             }
             return sum(progress.values()) / len(progress)
         elif self.goal_type == 'diversity':
-            from investments.portfolio_analyzer import PortfolioAnalyzer
-            analyzer = PortfolioAnalyzer()
-            analysis = analyzer.get_diversification_recommendations(self.user)
-            
-            category_dist = analysis['category_distribution']
-            tech_dist = analysis['technology_distribution']
+            category_dist = snapshot['category_distribution']
+            tech_dist = snapshot['technology_distribution']
             
             if not category_dist or not tech_dist:
                 return 0
@@ -139,4 +215,4 @@ class InvestmentGoal(models.Model):
             category_score = 100 - max(category_dist.values()) if category_dist else 0
             tech_score = 100 - max(tech_dist.values()) if tech_dist else 0
             
-            return (category_score + tech_score) / 2
\ No newline at end of file
+            return (category_score + tech_score) / 2
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.utils import timezone
+
+from investments.portfolio_analyzer import PortfolioAnalyzer
+
+
+class PortfolioAssembler:
+    """Builds everything the dashboard shows about a user's portfolio from one read.
+
+    The investments are loaded with their initiatives and categories in two
+    queries, and holdings, totals, impact by category, the category and monthly
+    charts and the diversification analysis come from a single pass over them,
+    so the number of queries does not grow with the portfolio.
+    """
+
+    def __init__(self, user, analyzer=None):
+        self.user = user
+        self.analyzer = analyzer or PortfolioAnalyzer()
+
+    def load_investments(self):
+        return list(
+            self.user.investments.select_related('initiative').prefetch_related('initiative__categories')
+        )
+
+    def assemble(self):
+        investments = self.load_investments()
+
+        total_invested = Decimal('0')
+        total_impact = {'carbon': 0, 'energy': 0, 'water': 0}
+        holdings = {}
+        impact_by_category = defaultdict(lambda: {'carbon': 0, 'energy': 0, 'water': 0})
+        category_amounts = defaultdict(Decimal)  # None collects uncategorized investments
+        technology_amounts = defaultdict(Decimal)
+        monthly_amounts = defaultdict(Decimal)
+
+        for investment in investments:
+            initiative = investment.initiative
+            amount = investment.amount
+            impact = {
+                'carbon': investment.carbon_impact,
+                'energy': investment.energy_impact,
+                'water': investment.water_impact,
+            }
+
+            total_invested += amount
+            for metric, value in impact.items():
+                total_impact[metric] += value
+
+            # Group investments by initiative
+            holding = holdings.get(initiative.id)
+            if holding is None:
+                holding = holdings[initiative.id] = {
+                    'initiative': initiative,
+                    'total_amount': 0,
+                    'last_investment_date': investment.created_at,
+                    'impact_metrics': {'carbon': 0, 'energy': 0, 'water': 0}
+                }
+            holding['total_amount'] += amount
+            holding['last_investment_date'] = max(holding['last_investment_date'], investment.created_at)
+            for metric, value in impact.items():
+                holding['impact_metrics'][metric] += value
+
+            category_names = [category.name for category in initiative.categories.all()]
+            for category_name in category_names or [None]:
+                category_amounts[category_name] += amount
+            for category_name in category_names:
+                for metric, value in impact.items():
+                    impact_by_category[category_name][metric] += value
+
+            technology_amounts[initiative.technology_type] += amount
+            monthly_amounts[self.month_of(investment.created_at)] += amount
+
+        recent_holdings = sorted(holdings.values(), key=lambda x: x['last_investment_date'], reverse=True)[:5]
+        for holding in recent_holdings:
+            holding['impact_metrics'] = {k: round(v) for k, v in holding['impact_metrics'].items()}
+
+        if total_invested:
+            analysis = self.analyzer.diversification_analysis(
+                {name: total for name, total in category_amounts.items() if name is not None},
+                dict(technology_amounts),
+                total_invested
+            )
+        else:
+            analysis = {'category_distribution': {}, 'technology_distribution': {}, 'recommendations': []}
+
+        return {
+            'initiative_ids': sorted(holdings),
+            'total_invested': total_invested,
+            'total_impact': {k: round(v) for k, v in total_impact.items()},
+            'recent_investments': recent_holdings,
+            'impact_by_category': {
+                name: {k: round(v) for k, v in impact.items()} for name, impact in impact_by_category.items()
+            },
+            'category_distribution': [
+                {'name': name, 'total': total}
+                for name, total in sorted(category_amounts.items(), key=lambda item: item[1], reverse=True)
+            ],
+            'monthly_trends': [{'month': month, 'total': monthly_amounts[month]} for month in sorted(monthly_amounts)],
+            'portfolio_analysis': analysis,
+        }
+
+    @staticmethod
+    def month_of(moment):
+        """Start of the month of moment in the current time zone, like TruncMonth"""
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
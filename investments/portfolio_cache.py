@@ -0,0 +1,96 @@
+"""Cached per-user dashboard portfolio summaries.
+
+A summary is what PortfolioAssembler builds for the dashboard plus the totals
+on the user's profile. It is cached under a key holding the user's current
+summary version, kept in the cache as well. The signal handlers in
+investments.signals (and the bulk write paths) drop the version once their
+transaction commits, so the next dashboard load starts a new version. A load
+that read the database before the commit can only store its result under the
+old version, which nobody asks for again.
+
+Summaries live in the DASHBOARD_CACHE_ALIAS cache, which must be shared by
+all worker processes so that an invalidation reaches every one of them. With a
+per-process backend (LocMemCache) another worker would keep serving a stale
+summary, so summaries are then built on every load instead of cached.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from investments.instrumentation import metrics
+from investments.portfolio_assembler import PortfolioAssembler
+from users.models import Profile
+
+
+# Backends whose entries are private to one process (or not kept at all)
+UNSHARED_BACKENDS = (LocMemCache, DummyCache)
+
+
+def summary_cache():
+    """The cache holding the summaries, or None when it is not shared between processes"""
+    backend = caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+    if isinstance(backend, UNSHARED_BACKENDS):
+        return None
+    return backend
+
+
+def version_cache_key(user_id):
+    return f'portfolio-version:{user_id}'
+
+
+def summary_cache_key(user_id, version):
+    return f'portfolio-summary:{user_id}:{version}'
+
+
+def get_summary_version(cache, user_id):
+    key = version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Never reuses a dropped version, even after the cache was cleared
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def build_portfolio_summary(user):
+    summary = PortfolioAssembler(user).assemble()
+    # Totals are maintained on the profile by each investment save and delete
+    profile, _ = Profile.objects.get_or_create(user=user)
+    summary['total_invested'] = profile.total_invested
+    summary['total_impact'] = {
+        'carbon': round(profile.carbon_reduced),
+        'energy': round(profile.energy_saved),
+        'water': round(profile.water_conserved),
+    }
+    return summary
+
+
+def get_portfolio_summary(user):
+    """Return the user's dashboard summary, building and caching it when there is no current one"""
+    cache = summary_cache()
+    if cache is None:
+        metrics.increment('dashboard.cache.disabled')
+        return build_portfolio_summary(user)
+
+    key = summary_cache_key(user.pk, get_summary_version(cache, user.pk))
+    summary = cache.get(key)
+    if summary is not None:
+        metrics.increment('dashboard.cache.hits')
+        return summary
+
+    metrics.increment('dashboard.cache.misses')
+    summary = build_portfolio_summary(user)
+    cache.set(key, summary, settings.DASHBOARD_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_portfolio_summaries(user_ids):
+    """Start new summary versions for the users once the current transaction commits"""
+    cache = summary_cache()
+    keys = [version_cache_key(user_id) for user_id in set(user_ids)]
+    if cache is not None and keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
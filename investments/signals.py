@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from initiatives.models import Initiative
+from .impact_profiles import invalidate_impact_profiles
+from .models import Investment
+from .portfolio_cache import invalidate_portfolio_summaries
+
+# Drop cached impact profiles whenever an initiative's prediction inputs change
+@receiver(post_save, sender=Initiative)
+@receiver(post_delete, sender=Initiative)
+def invalidate_initiative_impact_profile(sender, instance, **kwargs):
+    invalidate_impact_profiles([instance.pk])
+
+# Dashboards summarize the user's investments and the initiatives they hold
+@receiver(post_save, sender=Investment)
+@receiver(post_delete, sender=Investment)
+def invalidate_investor_portfolio(sender, instance, **kwargs):
+    invalidate_portfolio_summaries([instance.user_id])
+
+# Investment.delete(), queryset deletes and cascades all send post_delete
+@receiver(post_delete, sender=Investment)
+def remove_deleted_investment_from_totals(sender, instance, **kwargs):
+    instance.remove_from_totals()
+
+def invalidate_holder_portfolios(initiative_ids):
+    invalidate_portfolio_summaries(
+        Investment.objects.filter(initiative_id__in=initiative_ids).values_list('user_id', flat=True).distinct()
+    )
+
+@receiver(post_save, sender=Initiative)
+def invalidate_initiative_holder_portfolios(sender, instance, **kwargs):
+    invalidate_holder_portfolios([instance.pk])
+
+def categories_changed(initiative_ids):
+    # Categories are prediction inputs too, so mark the initiatives as changed
+    # for update_impact_metrics --changed-only
+    Initiative.objects.filter(pk__in=initiative_ids).update(updated_at=timezone.now())
+    invalidate_impact_profiles(initiative_ids)
+    invalidate_holder_portfolios(initiative_ids)
+
+@receiver(m2m_changed, sender=Initiative.categories.through)
+def invalidate_impact_profiles_on_category_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance is the Initiative whose categories changed
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            categories_changed([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # instance is a Category; pk_set holds the affected initiative ids
+        categories_changed(pk_set)
+    elif action == 'pre_clear':
+        # pk_set is not provided for clear, so collect the initiatives before they are detached
+        categories_changed(list(instance.initiatives.values_list('pk', flat=True)))
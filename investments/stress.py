@@ -0,0 +1,118 @@
+"""Concurrent load harness for the investment write path.
+
+hammer() starts a number of threads that each log in a test client and POST
+investments to invest_initiative at the same time, then reports throughput,
+latency percentiles and how every request ended. check_funding() verifies
+that each initiative's current_amount equals the sum of its investments and
+that its status agrees with its goal. Threads share the database, so run it
+against a file-backed SQLite database (see the stress_invest command) or a
+server database, never an in-memory one.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.test import Client
+from django.urls import reverse
+
+from initiatives.models import Initiative
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of values, or None when there are none"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def hammer(initiative_ids, users, threads=8, requests_per_thread=25, amount=Decimal('1000')):
+    """POST investments from concurrent threads and return a summary dict.
+
+    Thread t sends its n-th request to initiative_ids[(t + n) % len(initiative_ids)]
+    as users[t % len(users)], so one id hammers a single initiative and many ids
+    spread the load.
+    """
+    dashboard_url = reverse('dashboard')
+    start = threading.Barrier(threads)
+    lock = threading.Lock()
+    latencies = []
+    outcomes = {'invested': 0, 'refused': 0, 'failed': 0}
+    errors = []
+
+    def worker(thread_index):
+        client = Client()
+        client.force_login(users[thread_index % len(users)])
+        thread_latencies = []
+        thread_outcomes = dict.fromkeys(outcomes, 0)
+        try:
+            start.wait()
+            for n in range(requests_per_thread):
+                initiative_id = initiative_ids[(thread_index + n) % len(initiative_ids)]
+                started = time.perf_counter()
+                try:
+                    response = client.post(reverse('invest_initiative', args=[initiative_id]), {'amount': str(amount)})
+                except Exception as e:
+                    thread_outcomes['failed'] += 1
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                thread_latencies.append(time.perf_counter() - started)
+
+                if response.status_code == 302 and response.url == dashboard_url:
+                    thread_outcomes['invested'] += 1
+                elif any('An error occurred' in str(message) for message in get_messages(response.wsgi_request)):
+                    thread_outcomes['failed'] += 1
+                else:
+                    # Re-rendered form: the initiative is funded or lacks room for the amount
+                    thread_outcomes['refused'] += 1
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(thread_latencies)
+                for key, count in thread_outcomes.items():
+                    outcomes[key] += count
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'threads': threads,
+        'requests': threads * requests_per_thread,
+        'elapsed': elapsed,
+        'investments_per_second': outcomes['invested'] / elapsed if elapsed else 0,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0,
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'errors': errors,
+        **outcomes,
+    }
+
+
+def check_funding(initiative_ids=None):
+    """Return a list of problems: funding that does not match the investments or the status"""
+    initiatives = Initiative.objects.all()
+    if initiative_ids is not None:
+        initiatives = initiatives.filter(pk__in=initiative_ids)
+    rows = initiatives.annotate(
+        invested=Coalesce(Sum('investments__amount'), Value(Decimal('0')), output_field=DecimalField())
+    ).values_list('pk', 'current_amount', 'invested', 'goal_amount', 'status')
+
+    problems = []
+    for pk, current_amount, invested, goal_amount, status in rows:
+        if current_amount != invested:
+            problems.append(f"Initiative {pk}: current_amount {current_amount} != sum of investments {invested}")
+        if current_amount > goal_amount:
+            problems.append(f"Initiative {pk}: current_amount {current_amount} exceeds goal {goal_amount}")
+        if (status == 'funded' and current_amount < goal_amount) or (status == 'active' and current_amount >= goal_amount):
+            problems.append(f"Initiative {pk}: status '{status}' with {current_amount} of {goal_amount}")
+    return problems
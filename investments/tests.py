@@ -1,3 +1,669 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from sklearn.ensemble import RandomForestRegressor
+
+from initiatives.models import Category, Initiative
+from users.models import Profile
+from . import batching, impact_calculator, model_store
+from .forest import CompiledForest
+from .impact_calculator import get_impact_calculator
+from .impact_profiles import get_impact_profile, profile_cache_key
+from .impact_rules import CATEGORY_BASE
+from .goal_progress import goal_progress
+from .ingest import ingest_investments
+from .models import Investment, InvestmentGoal
+from .portfolio_analyzer import PortfolioAnalyzer
+from .stress import check_funding, hammer
+from .training import load_legacy_models
+
+
+class CompiledForestTests(SimpleTestCase):
+    def test_matches_sklearn_on_fitted_forests(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(200, 6))
+        forests = [
+            RandomForestRegressor(n_estimators=10, max_depth=depth, random_state=depth).fit(X, X @ rng.normal(size=6))
+            for depth in (2, 4, 8)
+        ]
+        compiled = CompiledForest.from_forests(forests)
+
+        X_test = rng.normal(size=(3000, 6))
+        expected = np.column_stack([forest.predict(X_test) for forest in forests])
+        np.testing.assert_allclose(compiled.predict(X_test), expected, rtol=1e-10, atol=1e-10)
+
+    def test_matches_sklearn_on_multi_output_forest(self):
+        rng = np.random.default_rng(2)
+        X = rng.normal(size=(200, 6))
+        forest = RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0).fit(X, X @ rng.normal(size=(6, 3)))
+        compiled = CompiledForest.from_forests([forest])
+
+        X_test = rng.normal(size=(3000, 6))
+        np.testing.assert_allclose(compiled.predict(X_test), forest.predict(X_test), rtol=1e-10, atol=1e-10)
+
+    def test_matches_sklearn_on_shipped_models(self):
+        # The served model version was imported from the legacy pickles
+        calculator = get_impact_calculator()
+        forests, scaler = load_legacy_models()
+        X = np.random.default_rng(1).normal(size=(500, calculator.scaler_mean.shape[0]))
+        expected = np.column_stack([forest.predict(X) for forest in forests])
+        np.testing.assert_allclose(calculator.forest.predict(X), expected, rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(calculator.scaler_mean, scaler.mean_)
+        np.testing.assert_allclose(calculator.scaler_scale, scaler.scale_)
+
+
+def legacy_rule_impact(category_names, duration, scale, location, technology, categories, locations, technologies):
+    """The hand-written category rules the rule table replaced, without variation.
+
+    Returns None for rows that fall back to the model. Kept as the reference the
+    compiled table is checked against.
+    """
+    location = location if location in locations else 'Uttar Pradesh'
+    technology = technology if technology in technologies else 'Manual'
+    primary = next((i for i, name in enumerate(categories) if name in category_names), -1)
+    primary_name = categories[primary] if primary >= 0 else None
+
+    duration_factor = duration / 12.0 if duration <= 12 else 1.0 + (np.sqrt(duration / 12.0) - 1.0) * 0.5
+    factor = (0.3 + 0.7 * scale ** 0.4) * duration_factor
+
+    if primary_name == 'Reforestation':
+        carbon, energy, water = 500 * factor, 0, 1000 * factor
+        if location in ('Assam', 'Kerala', 'Meghalaya', 'West Bengal', 'Nagaland'):
+            water *= 1.2
+    elif primary_name == 'Renewable Energy':
+        multiplier = 1.15 if technology == 'Solar' else (0.9 if technology == 'Wind' else 0.8)
+        carbon, energy, water = 45 * factor * multiplier, 50 * factor * multiplier, 0
+        if scale >= 5:
+            energy *= 1.2
+        if location in ('Rajasthan', 'Gujarat'):
+            energy *= 1.1
+    elif primary_name == 'Emission Control':
+        carbon, energy, water = 350 * factor, 80 * factor, 100 * factor
+        if scale >= 4:
+            carbon = 1500
+    elif primary_name == 'Water Conservation':
+        carbon, energy, water = 80 * factor, 30 * factor, 1500 * factor
+        if location in ('Assam', 'Kerala', 'Meghalaya'):
+            water *= 1.15
+    elif primary_name == 'Recycling':
+        carbon, energy, water = 200 * factor, 120 * factor, 200 * factor
+    elif primary_name == 'Clean Transportation':
+        carbon, energy, water = 300 * factor, 250 * factor, 0
+    elif primary_name == 'Ocean Conservation':
+        carbon, energy, water = 150 * factor, 0, 1200 * factor
+    elif primary_name == 'Waste Management':
+        carbon, energy, water = 220 * factor, 180 * factor, 100 * factor
+    elif primary_name == 'Green Technology':
+        carbon, energy, water = 150 * factor, 220 * factor, 50 * factor
+        if technology == 'AI':
+            water = 0
+    else:
+        return None
+    return carbon, energy, water
+
+
+class ImpactRulesTests(SimpleTestCase):
+    def test_rule_table_matches_the_legacy_rules(self):
+        calculator = get_impact_calculator()
+        schema = calculator.schema
+        # Every category on its own, plus pairs checking which category takes priority
+        category_lists = [[name] for name in schema.categories] + [
+            ['Ocean Conservation', 'Recycling'], ['Green Technology', 'Renewable Energy'],
+            ['Sustainable Agriculture', 'Reforestation'], ['Unknown'], [],
+        ]
+        rows = [
+            (names, duration, scale, location, technology)
+            for names in category_lists
+            for duration in (6, 36)
+            for scale in range(1, 11)
+            for location in schema.locations + ('North India',)
+            for technology in schema.technologies + ('Tidal',)
+        ]
+        impacts = calculator.predict_impact_batch(
+            1000, [row[0] for row in rows],
+            project_duration_months=[row[1] for row in rows], project_scale=[row[2] for row in rows],
+            location=[row[3] for row in rows], technology_type=[row[4] for row in rows], variation='none'
+        )
+
+        checked, actual, expected = set(), [], []
+        for row, impact in zip(rows, impacts):
+            legacy = legacy_rule_impact(*row, schema.categories, schema.locations, schema.technologies)
+            if legacy is None:
+                continue
+            if len(row[0]) == 1:
+                checked.add(row[0][0])
+            actual.append([impact['carbon'], impact['energy'], impact['water']])
+            expected.append(legacy)
+        np.testing.assert_allclose(actual, expected, atol=0.006)
+        self.assertEqual(checked, {name for name, base in CATEGORY_BASE.items() if base is not None})
+
+    def test_energy_is_zeroed_on_the_model_path(self):
+        impact = get_impact_calculator().predict_impact(1000, ['Sustainable Agriculture'], variation='none')
+        self.assertEqual(impact['energy'], 0)
+
+
+class ModelReloadTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.version = get_impact_calculator().version
+        self.copy_version(self.version)
+        model_store.activate_version(self.root, self.version)
+
+        # Start from an empty process-wide calculator that re-reads CURRENT on every call
+        for name, value in (('_calculator', None), ('_next_version_check', 0.0)):
+            patcher = mock.patch.object(impact_calculator, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        settings = override_settings(IMPACT_MODEL_ROOT=self.root, IMPACT_MODEL_RELOAD_INTERVAL=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def copy_version(self, version, name=None):
+        source = model_store.version_path(impact_calculator.model_root(), self.version)
+        destination = model_store.version_path(self.root, name or version)
+        shutil.copytree(source, destination)
+        return destination
+
+    def assert_keeps_serving(self, broken):
+        calculator = get_impact_calculator()
+        model_store.activate_version(self.root, broken)
+        with self.assertLogs('investments', 'ERROR'):
+            self.assertIs(get_impact_calculator(), calculator)
+        self.assertEqual(calculator.version, self.version)
+
+    def test_a_version_with_a_different_layout_is_not_swapped_in(self):
+        directory = self.copy_version(self.version, 'relabelled')
+        with open(os.path.join(directory, model_store.MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        manifest['feature_columns'] = list(reversed(manifest['feature_columns']))
+        with open(os.path.join(directory, model_store.MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f)
+        self.assert_keeps_serving('relabelled')
+
+    def test_a_version_with_a_missing_array_is_not_swapped_in(self):
+        directory = self.copy_version(self.version, 'incomplete')
+        os.remove(os.path.join(directory, 'value.npy'))
+        self.assert_keeps_serving('incomplete')
+
+    def test_first_load_still_fails_loudly(self):
+        directory = self.copy_version(self.version, 'incomplete')
+        os.remove(os.path.join(directory, 'value.npy'))
+        model_store.activate_version(self.root, 'incomplete')
+        with self.assertRaises(impact_calculator.ImpactModelUnavailable):
+            get_impact_calculator()
+
+
+class FakeCalculator:
+    """Records predict_from_profiles() calls; the first call waits until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.error = None
+        self.busy = threading.Event()
+        self.release = threading.Event()
+
+    def predict_from_profiles(self, profiles, amounts, variation=None):
+        if not self.calls:
+            self.busy.set()
+            self.release.wait(5)
+        amounts = np.broadcast_to(np.asarray(amounts, dtype=float), (len(profiles),)).tolist()
+        self.calls.append((list(profiles), amounts))
+        if self.error:
+            raise self.error
+        return [{'profile': profile, 'amount': amount} for profile, amount in zip(profiles, amounts)]
+
+
+class ImpactBatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.calculator = FakeCalculator()
+        patcher = mock.patch.object(batching, 'get_impact_calculator', return_value=self.calculator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.calculator.release.set)
+
+    def queue_behind_busy_worker(self, batcher, count):
+        """Submit count predictions from as many threads while the worker resolves another one"""
+        first = batcher.submit('first', 1)
+        self.assertTrue(self.calculator.busy.wait(5))
+        results = [None] * count
+        errors = [None] * count
+
+        def predict(n):
+            try:
+                results[n] = batcher.predict(f'profile {n}', n, timeout=5)
+            except Exception as e:
+                errors[n] = e
+
+        threads = [threading.Thread(target=predict, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while batcher._queue.qsize() < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.calculator.release.set()
+        for thread in threads:
+            thread.join(5)
+        return first, results, errors
+
+    def test_concurrent_predictions_are_resolved_in_one_call(self):
+        batcher = batching.ImpactBatcher(window=0.05)
+        first, results, errors = self.queue_behind_busy_worker(batcher, 8)
+
+        self.assertEqual(first.result(5), {'profile': 'first', 'amount': 1.0})
+        self.assertEqual(errors, [None] * 8)
+        self.assertEqual(results, [{'profile': f'profile {n}', 'amount': float(n)} for n in range(8)])
+        self.assertEqual(len(self.calculator.calls), 2)
+        self.assertEqual(sorted(self.calculator.calls[1][1]), [float(n) for n in range(8)])
+
+    def test_errors_reach_every_request_in_the_batch(self):
+        self.calculator.error = ValueError('broken model')
+        batcher = batching.ImpactBatcher(window=0.05)
+        with self.assertLogs('investments', 'ERROR'):
+            first, results, errors = self.queue_behind_busy_worker(batcher, 3)
+
+        self.assertRaises(ValueError, first.result, 5)
+        self.assertEqual(results, [None] * 3)
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+    def test_a_lone_prediction_does_not_wait_for_the_window(self):
+        self.calculator.release.set()
+        batcher = batching.ImpactBatcher(window=10)
+        self.assertEqual(batcher.predict('alone', 5, timeout=1), {'profile': 'alone', 'amount': 5.0})
+
+    @override_settings(IMPACT_BATCH_WINDOW_MS=0)
+    def test_a_zero_window_predicts_directly(self):
+        self.calculator.release.set()
+        self.assertIsNone(batching.get_impact_batcher())
+        self.assertEqual(batching.predict_impact('direct', 3), {'profile': 'direct', 'amount': 3.0})
+        self.assertEqual(self.calculator.calls, [(['direct'], [3.0])])
+
+    def test_async_prediction_goes_through_the_batcher(self):
+        self.calculator.release.set()
+        impact = asyncio.run(batching.apredict_impact('async', 7))
+        self.assertEqual(impact, {'profile': 'async', 'amount': 7.0})
+
+
+class ImpactVariationTests(SimpleTestCase):
+    def predict(self, variation=None):
+        return get_impact_calculator().predict_impact_batch(
+            [1000, 2500], [['Recycling'], ['Sustainable Agriculture']], project_scale=[3, 6], variation=variation
+        )
+
+    def test_deterministic_variation_depends_only_on_inputs_and_seed(self):
+        impacts = self.predict('deterministic')
+        self.assertEqual(self.predict('deterministic'), impacts)
+        self.assertNotEqual(impacts, self.predict('none'))
+        with override_settings(IMPACT_VARIATION_SEED=1):
+            self.assertNotEqual(self.predict('deterministic'), impacts)
+
+    def test_random_variation_differs_between_calls(self):
+        self.assertNotEqual(self.predict('random'), self.predict('random'))
+
+    def test_none_disables_variation(self):
+        factors = get_impact_calculator().variation_factors(4, 'none')
+        np.testing.assert_array_equal(factors, np.ones((4, 3)))
+
+    @override_settings(IMPACT_VARIATION_MODE='jitter')
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.predict()
+
+
+class ImpactProfileCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.recycling, self.reforestation = (
+            Category.objects.create(name=name) for name in ('Recycling', 'Reforestation')
+        )
+        self.initiative = Initiative.objects.create(
+            title='Paper mill', description='Test', status='active', goal_amount=Decimal('100000'),
+            min_investment=Decimal('1')
+        )
+        self.initiative.categories.add(self.recycling)
+
+    def cached_profile(self):
+        self.initiative.refresh_from_db()
+        profile = get_impact_profile(self.initiative)
+        self.assertIsNotNone(cache.get(profile_cache_key(self.initiative.pk)))
+        return profile
+
+    def assert_invalidated(self, change, categories):
+        self.cached_profile()
+        updated_at = self.initiative.updated_at
+        change()
+        self.assertIsNone(cache.get(profile_cache_key(self.initiative.pk)))
+        profile = self.cached_profile()
+        self.assertGreater(self.initiative.updated_at, updated_at)
+        self.assertEqual(profile['category_names'], categories)
+
+    def test_forward_category_changes_invalidate_the_profile(self):
+        self.assert_invalidated(lambda: self.initiative.categories.add(self.reforestation), ['Recycling', 'Reforestation'])
+        self.assert_invalidated(lambda: self.initiative.categories.remove(self.recycling), ['Reforestation'])
+        self.assert_invalidated(self.initiative.categories.clear, [])
+
+    def test_reverse_category_changes_invalidate_the_profile(self):
+        self.assert_invalidated(lambda: self.reforestation.initiatives.add(self.initiative), ['Recycling', 'Reforestation'])
+        self.assert_invalidated(lambda: self.recycling.initiatives.remove(self.initiative), ['Reforestation'])
+        self.assert_invalidated(self.reforestation.initiatives.clear, [])
+
+    def test_stale_stamps_are_recomputed(self):
+        profile = self.cached_profile()
+        key = profile_cache_key(self.initiative.pk)
+        version = get_impact_calculator().version
+        stale = dict(profile, category_names=['Stale'])
+
+        # Written by an older model version
+        cache.set(key, {'stamp': (self.initiative.updated_at.isoformat(), 'old-version'), 'profile': stale})
+        self.assertEqual(get_impact_profile(self.initiative), profile)
+
+        # Cached before an update that sent no signal
+        cache.set(key, {'stamp': (self.initiative.updated_at.isoformat(), version), 'profile': stale})
+        Initiative.objects.filter(pk=self.initiative.pk).update(project_scale=5)
+        self.initiative.refresh_from_db()
+        self.assertEqual(get_impact_profile(self.initiative), stale)
+        Initiative.objects.filter(pk=self.initiative.pk).update(updated_at=timezone.now())
+        self.initiative.refresh_from_db()
+        self.assertEqual(get_impact_profile(self.initiative)['project_scale'], 5.0)
+
+
+class ConcurrentInvestmentTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Concurrent connections need a file-backed SQLite test database')
+
+    def test_concurrent_investments_keep_funding_consistent(self):
+        users = [
+            get_user_model().objects.create_user(username=f'investor{n}', email=f'investor{n}@example.com')
+            for n in range(4)
+        ]
+        initiative = Initiative.objects.create(
+            title='Solar rooftops', description='Test', status='active',
+            goal_amount=Decimal('10000'), min_investment=Decimal('1')
+        )
+        initiative.categories.add(Category.objects.create(name='Renewable Energy'))
+
+        # 20 requests of 1000 against room for 10
+        result = hammer([initiative.pk], users, threads=4, requests_per_thread=5, amount=Decimal('1000'))
+
+        self.assertEqual(result['failed'], 0, result['errors'])
+        self.assertEqual(result['invested'], 10)
+        self.assertEqual(check_funding([initiative.pk]), [])
+        initiative.refresh_from_db()
+        self.assertEqual(initiative.status, 'funded')
+        # Each accepted investment also reached its investor's profile totals
+        for user in users:
+            profile = Profile.objects.get(user=user)
+            self.assertEqual(profile.investment_count, user.investments.count())
+            self.assertEqual(profile.total_invested, Decimal('1000') * profile.investment_count)
+
+
+class ProfileTotalsTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = (
+            get_user_model().objects.create_user(username=name, email=f'{name}@example.com') for name in ('alice', 'bob')
+        )
+        category = Category.objects.create(name='Recycling')
+        self.initiatives = []
+        for title in ('Paper mill', 'Glass plant'):
+            initiative = Initiative.objects.create(
+                title=title, description='Test', status='active', goal_amount=Decimal('100000'),
+                min_investment=Decimal('1')
+            )
+            initiative.categories.add(category)
+            self.initiatives.append(initiative)
+        self.investment = Investment.invest(self.alice, self.initiatives[0], Decimal('1000'))
+        Investment.invest(self.alice, self.initiatives[1], Decimal('500'))
+
+    def assert_totals_match_investments(self):
+        self.assertEqual(check_funding([initiative.pk for initiative in self.initiatives]), [])
+        for user in (self.alice, self.bob):
+            profile = Profile.objects.get(user=user)
+            investments = list(user.investments.all())
+            self.assertEqual(profile.total_invested, sum((i.amount for i in investments), Decimal('0')))
+            self.assertEqual(profile.investment_count, len(investments))
+            self.assertAlmostEqual(profile.carbon_reduced, sum(i.carbon_impact for i in investments))
+            self.assertAlmostEqual(profile.energy_saved, sum(i.energy_impact for i in investments))
+            self.assertAlmostEqual(profile.water_conserved, sum(i.water_impact for i in investments))
+
+    def test_new_investments_are_counted(self):
+        self.assert_totals_match_investments()
+        self.assertEqual(Profile.objects.get(user=self.alice).investment_count, 2)
+
+    def test_amount_edit(self):
+        carbon = self.investment.carbon_impact
+        self.investment.amount = Decimal('3000')
+        self.investment.save()
+        self.assertGreater(self.investment.carbon_impact, carbon)
+        self.assert_totals_match_investments()
+
+    def test_impact_edit(self):
+        self.investment.carbon_impact += 250
+        self.investment.save(update_fields=['carbon_impact'])
+        self.assert_totals_match_investments()
+
+    def test_move_to_another_user(self):
+        self.investment.user = self.bob
+        self.investment.save()
+        self.assert_totals_match_investments()
+        self.assertEqual(Profile.objects.get(user=self.bob).investment_count, 1)
+
+    def test_move_to_another_initiative(self):
+        self.investment.initiative = self.initiatives[1]
+        self.investment.amount = Decimal('2000')
+        self.investment.save()
+        self.assert_totals_match_investments()
+        self.initiatives[0].refresh_from_db()
+        self.assertEqual(self.initiatives[0].current_amount, 0)
+
+    def test_delete(self):
+        # The stored amount comes off the totals, once, whatever was edited in memory
+        self.investment.amount = Decimal('5000')
+        self.investment.delete()
+        self.assert_totals_match_investments()
+        self.assertEqual(Profile.objects.get(user=self.alice).investment_count, 1)
+        self.assertEqual(self.investment.initiative.current_amount, 0)
+
+    def test_queryset_delete(self):
+        Investment.objects.filter(pk=self.investment.pk).delete()
+        self.assert_totals_match_investments()
+
+    def test_initiative_delete_cascades_to_the_totals(self):
+        self.initiatives.pop(0).delete()
+        self.assert_totals_match_investments()
+        self.assertEqual(Profile.objects.get(user=self.alice).investment_count, 1)
+
+    def test_user_delete_withdraws_the_funding(self):
+        self.alice.delete()
+        self.assertFalse(Profile.objects.filter(user_id=self.alice.pk).exists())
+        self.assertEqual(check_funding([initiative.pk for initiative in self.initiatives]), [])
+
+    def test_reconcile_rebuilds_drifted_totals(self):
+        Profile.objects.filter(user=self.alice).update(total_invested=Decimal('99'))
+        Profile.objects.filter(user=self.bob).update(investment_count=3, carbon_reduced=12.5)
+
+        call_command('reconcile_profile_totals', '--dry-run', stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=self.bob).investment_count, 3)
+
+        out = StringIO()
+        call_command('reconcile_profile_totals', stdout=out)
+        self.assertIn('2 with drifted totals', out.getvalue())
+        self.assert_totals_match_investments()
+
+
+class IngestInvestmentsTests(TestCase):
+    def test_rows_are_checked_in_order_and_funding_is_aggregated(self):
+        user = get_user_model().objects.create_user(username='importer', email='importer@example.com')
+        initiative = Initiative.objects.create(
+            title='Wind farm', description='Test', status='active', goal_amount=Decimal('5000'),
+            min_investment=Decimal('500'), max_investment=Decimal('3000')
+        )
+        initiative.categories.add(Category.objects.create(name='Renewable Energy'))
+
+        result = ingest_investments([
+            {'username': 'importer', 'initiative_id': initiative.pk, 'amount': '2000'},
+            {'email': 'importer@example.com', 'initiative_id': initiative.pk, 'amount': '100'},  # below minimum
+            {'user_id': user.pk, 'initiative_id': initiative.pk, 'amount': '4000'},  # above maximum
+            {'username': 'nobody', 'initiative_id': initiative.pk, 'amount': '1000'},
+            {'username': 'importer', 'initiative_id': initiative.pk, 'amount': '3000',
+             'created_at': '2024-05-01T10:00:00'},
+            {'username': 'importer', 'initiative_id': initiative.pk, 'amount': '500'},  # goal already reached
+        ])
+
+        self.assertEqual(len(result['created']), 2)
+        self.assertEqual([number for number, _ in result['rejected']], [2, 3, 4, 6])
+        self.assertEqual(check_funding([initiative.pk]), [])
+        initiative.refresh_from_db()
+        self.assertEqual(initiative.status, 'funded')
+        self.assertEqual(user.investments.filter(created_at__year=2024).count(), 1)
+        profile = Profile.objects.get(user=user)
+        self.assertEqual((profile.total_invested, profile.investment_count), (Decimal('5000'), 2))
+        self.assertAlmostEqual(profile.carbon_reduced, sum(i.carbon_impact for i in user.investments.all()))
+
+    def test_dry_run_carries_the_remaining_amount_across_chunks(self):
+        get_user_model().objects.create_user(username='importer', email='importer@example.com')
+        initiative = Initiative.objects.create(
+            title='Wind farm', description='Test', status='active', goal_amount=Decimal('1000'),
+            min_investment=Decimal('1')
+        )
+        path = os.path.join(tempfile.mkdtemp(), 'investments.csv')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('username,initiative_id,amount\n' + f'importer,{initiative.pk},600\n' * 3)
+
+        summaries = []
+        for options in (['--dry-run'], []):
+            out = StringIO()
+            call_command('import_investments', path, '--chunk-size', '1', *options, stdout=out)
+            summaries.append(out.getvalue())
+        for summary in summaries:
+            self.assertIn('1 of 3 rows (2 rejected)', summary)
+        self.assertEqual(Investment.objects.filter(initiative=initiative).count(), 1)
+
+
+class PortfolioAnalyzerTests(TestCase):
+    def test_analyze_portfolio_matches_per_investment_arithmetic(self):
+        user = get_user_model().objects.create_user(username='analyst', email='analyst@example.com')
+        categories = [Category.objects.create(name=name) for name in ('Renewable Energy', 'Recycling', 'Reforestation')]
+        specs = [
+            # (amount, carbon per ₹1000, scale, risk level, categories)
+            (Decimal('1000.10'), 50.0, 1, 'low', categories[:2]),
+            (Decimal('2500.25'), 20.0, 5, 'high', categories[1:]),
+            (Decimal('499.99'), 10.0, 3, 'medium', []),
+        ]
+        for amount, carbon, scale, risk_level, initiative_categories in specs:
+            initiative = Initiative.objects.create(
+                title=f'Initiative {scale}', description='Test', status='active', goal_amount=Decimal('100000'),
+                min_investment=Decimal('1'), carbon_reduction_per_investment=carbon,
+                project_scale=scale, risk_level=risk_level
+            )
+            initiative.categories.set(initiative_categories)
+            Investment.invest(user, initiative, amount, impact={'carbon': 0, 'energy': 0, 'water': 0})
+
+        analyzer = PortfolioAnalyzer()
+        result = analyzer.analyze_portfolio(user.investments.all())
+
+        self.assertEqual(result['total_invested'], Decimal('4000.34'))
+        self.assertAlmostEqual(
+            result['total_impact']['carbon'], sum(float(amount) * carbon / 1000 for amount, carbon, *_ in specs)
+        )
+        self.assertAlmostEqual(result['risk_score'], ((1 + 1) / 2 + (5 + 5) / 2 + (3 + 3) / 2) / 3)
+        self.assertEqual(result['diversification_score'], 60)
+        self.assertEqual(analyzer.analyze_portfolio(list(user.investments.all())), result)
+
+    def test_analyze_portfolio_takes_slices_and_lists_as_given(self):
+        user = get_user_model().objects.create_user(username='slicer', email='slicer@example.com')
+        solar, recycling = (Category.objects.create(name=name) for name in ('Renewable Energy', 'Recycling'))
+        initiatives = []
+        for carbon, categories in [(10.0, [solar]), (20.0, [solar, recycling])]:
+            initiative = Initiative.objects.create(
+                title=f'Initiative {carbon}', description='Test', status='active', goal_amount=Decimal('100000'),
+                min_investment=Decimal('1'), carbon_reduction_per_investment=carbon
+            )
+            initiative.categories.set(categories)
+            initiatives.append(initiative)
+            Investment.invest(user, initiative, Decimal('1000'), impact={'carbon': 0, 'energy': 0, 'water': 0})
+        analyzer = PortfolioAnalyzer()
+
+        sliced = analyzer.analyze_portfolio(user.investments.order_by('initiative__carbon_reduction_per_investment')[:1])
+        self.assertEqual((sliced['total_invested'], sliced['total_impact']['carbon']), (Decimal('1000'), 10.0))
+        self.assertEqual(sliced['diversification_score'], 20)
+
+        investments = list(user.investments.all())
+        investments[0].amount = Decimal('3000')
+        investments.append(Investment(user=user, initiative=initiatives[1], amount=Decimal('500')))
+        result = analyzer.analyze_portfolio(investments)
+        self.assertEqual(result['total_invested'], Decimal('4500'))
+        self.assertAlmostEqual(
+            result['total_impact']['carbon'], sum(float(inv.amount) * inv.initiative.carbon_reduction_per_investment / 1000
+                                                  for inv in investments)
+        )
+        self.assertEqual(result['diversification_score'], 40)
+
+    def test_diversification_is_grouped_by_the_database(self):
+        user = get_user_model().objects.create_user(username='diverse', email='diverse@example.com')
+        solar, recycling = (Category.objects.create(name=name) for name in ('Renewable Energy', 'Recycling'))
+        for amount, technology, categories in [('3000', 'Solar', [solar]), ('1000', 'Wind', [solar, recycling]),
+                                                ('1000', 'Solar', [])]:
+            initiative = Initiative.objects.create(
+                title=f'{technology} {amount}', description='Test', status='active', goal_amount=Decimal('100000'),
+                min_investment=Decimal('1'), technology_type=technology
+            )
+            initiative.categories.set(categories)
+            Investment.invest(user, initiative, Decimal(amount), impact={'carbon': 0, 'energy': 0, 'water': 0})
+
+        with self.assertNumQueries(2):
+            analysis = PortfolioAnalyzer().get_diversification_recommendations(user)
+
+        self.assertEqual(analysis['category_distribution'], {'Renewable Energy': 80, 'Recycling': 20})
+        self.assertEqual(analysis['technology_distribution'], {'Solar': 80, 'Wind': 20})
+        self.assertEqual([rec['type'] for rec in analysis['recommendations']],
+                         ['category_diversification', 'technology_diversification'])
+
+
+class GoalProgressTests(TestCase):
+    def test_all_goals_share_one_snapshot_per_user(self):
+        users = [
+            get_user_model().objects.create_user(username=f'saver{n}', email=f'saver{n}@example.com') for n in range(2)
+        ]
+        category = Category.objects.create(name='Renewable Energy')
+        for user, amount in zip(users, ('2000', '500')):
+            initiative = Initiative.objects.create(
+                title=f'Initiative for {user.username}', description='Test', status='active',
+                goal_amount=Decimal('100000'), min_investment=Decimal('1')
+            )
+            initiative.categories.add(category)
+            Investment.invest(user, initiative, Decimal(amount), impact={'carbon': 100, 'energy': 0, 'water': 0})
+
+        goals = []
+        for user in users:
+            goals += [
+                InvestmentGoal.objects.create(user=user, goal_type='amount', target_amount=Decimal('4000'),
+                                              target_date='2030-01-01'),
+                InvestmentGoal.objects.create(user=user, goal_type='impact', target_carbon=200, target_energy=0,
+                                              target_water=0, target_date='2030-01-01'),
+                InvestmentGoal.objects.create(user=user, goal_type='diversity', target_date='2030-01-01'),
+            ]
+
+        with self.assertNumQueries(3):
+            progress = goal_progress(goals)
+
+        self.assertEqual(progress[:3], [50.0, 50.0 / 3, 0])
+        self.assertEqual(progress[3], 12.5)
+        self.assertEqual(progress, [goal.get_progress() for goal in goals])
@@ -0,0 +1,186 @@
+"""Offline training of the impact fallback models.
+
+Nothing here runs in the request path: the train_impact_models command trains
+and evaluates new forests, writes them as a versioned model bundle and then
+flips the CURRENT pointer that the web workers follow.
+"""
+import os
+import pickle
+
+import numpy as np
+from django.conf import settings
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+
+from investments.features import get_feature_schema
+
+TARGETS = ('carbon', 'energy', 'water')
+
+LEGACY_MODEL_FILES = {
+    'carbon': 'investments/models/carbon_model.pkl',
+    'energy': 'investments/models/energy_model.pkl',
+    'water': 'investments/models/water_model.pkl',
+    'scaler': 'investments/models/scaler.pkl',
+}
+
+
+def training_data():
+    """Return (X, y) with raw feature rows in FeatureSchema column order and a dict of target arrays"""
+    # Create a more diverse training dataset with varied locations, categories, scales and technologies
+    X = np.array([
+        # Renewable Energy - Solar (high energy savings, moderate carbon reduction, minimal water impact)
+        [500000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 12, 5, 0, 0],    # Solar large-scale in Rajasthan
+        [100000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 12, 3, 0, 0],    # Solar medium-scale in Rajasthan  
+        [10000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 6, 1, 0, 0],      # Solar small-scale in Rajasthan
+        
+        # Renewable Energy - Wind (high energy savings, good carbon reduction, zero water impact)
+        [750000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 18, 7, 1, 1],    # Wind large-scale in Gujarat
+        [70000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 12, 4, 1, 1],     # Wind medium-scale in Gujarat
+        [5000, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 6, 2, 1, 1],       # Wind small-scale in Gujarat
+        
+        # Recycling - Mechanical (moderate carbon reduction, low energy savings, moderate water savings)
+        [200000, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 12, 4, 13, 4],   # Recycling large-scale in Maharashtra
+        [50000, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 12, 3, 13, 4],    # Recycling medium-scale in Maharashtra
+        [5000, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 6, 2, 13, 4],      # Recycling small-scale in Maharashtra
+        
+        # Emission Control - Chemical (very high carbon reduction, low energy impact, low water impact)
+        [300000, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 12, 5, 25, 5],   # Emission control large-scale in UP
+        [75000, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 12, 3, 25, 5],    # Emission control medium-scale in UP
+        [3000, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 6, 2, 25, 5],      # Emission control small-scale in UP
+        
+        # Water Conservation (low carbon, minimal energy, extremely high water savings)
+        [250000, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 12, 4, 16, 2],   # Water conservation large-scale in Rajasthan
+        [25000, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 12, 2, 16, 2],    # Water conservation medium-scale in Rajasthan
+        [4000, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 6, 1, 16, 2],      # Water conservation small-scale in Rajasthan
+        
+        # Reforestation (highest carbon reduction, zero energy impact, good water conservation)
+        [150000, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 24, 5, 3, 3],    # Reforestation large-scale in Assam
+        [75000, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 18, 4, 3, 3],     # Reforestation medium-scale in Assam
+        [15000, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 12, 3, 3, 3],     # Reforestation small-scale in Assam
+        
+        # Clean Transportation - EV (high carbon reduction, high energy savings, minimal water impact)
+        [800000, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 18, 7, 13, 7],   # Clean transport large-scale in Maharashtra
+        [80000, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 12, 5, 13, 7],    # Clean transport medium-scale in Maharashtra
+        [8000, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 6, 2, 13, 7],      # Clean transport small-scale in Maharashtra
+        
+        # Waste Management (good carbon, moderate energy recovery, low water impact)
+        [600000, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 12, 6, 25, 4],   # Waste management large-scale in UP
+        [60000, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 12, 4, 25, 4],    # Waste management medium-scale in UP
+        [6000, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 6, 2, 25, 4],      # Waste management small-scale in UP
+        
+        # Green Technology (moderate across all metrics)
+        [700000, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 18, 7, 10, 9],   # Green tech large-scale in Karnataka
+        [70000, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 12, 5, 10, 9],    # Green tech medium-scale in Karnataka
+        [7000, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 6, 3, 10, 9],      # Green tech small-scale in Karnataka
+        
+        # Ocean Conservation (moderate carbon, low energy, extremely high water impact)
+        [350000, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 24, 6, 9, 2],    # Ocean conservation large-scale in Kerala
+        [35000, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 18, 4, 9, 2],     # Ocean conservation medium-scale in Kerala
+        [3500, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 12, 2, 9, 2],      # Ocean conservation small-scale in Kerala
+    ])
+
+    # Create impact values with category-specific focus
+    # Format: carbon (kg), energy (kWh), water (L) - per ₹1,000 investment
+    y_carbon = np.array([
+        750, 500, 150,      # Solar (by scale)
+        700, 450, 120,      # Wind (by scale)
+        300, 200, 80,       # Recycling (by scale)
+        900, 650, 250,      # Emission Control (by scale) - highest carbon reduction
+        100, 50, 20,        # Water Conservation (by scale)
+        950, 600, 300,      # Reforestation (by scale) - highest carbon reduction
+        800, 500, 150,      # Clean Transportation (by scale)
+        500, 300, 100,      # Waste Management (by scale)
+        400, 250, 80,       # Green Technology (by scale)
+        250, 150, 50,       # Ocean Conservation (by scale)
+    ])
+    
+    y_energy = np.array([
+        1000, 600, 200,     # Solar (by scale) - highest energy savings
+        900, 500, 150,      # Wind (by scale) - high energy savings
+        100, 70, 30,        # Recycling (by scale)
+        150, 90, 30,        # Emission Control (by scale)
+        30, 20, 0,          # Water Conservation (by scale) - can be zero
+        0, 0, 0,            # Reforestation (by scale) - zero energy impact
+        750, 450, 120,      # Clean Transportation (by scale) - high energy savings
+        400, 250, 80,       # Waste Management (by scale)
+        350, 200, 60,       # Green Technology (by scale)
+        50, 30, 0,          # Ocean Conservation (by scale) - can be zero
+    ])
+    
+    y_water = np.array([
+        50, 30, 0,          # Solar (by scale) - can be zero water impact
+        0, 0, 0,            # Wind (by scale) - zero water impact
+        200, 150, 50,       # Recycling (by scale)
+        300, 150, 50,       # Emission Control (by scale) - REDUCED water impact
+        3000, 2000, 1000,   # Water Conservation (by scale) - GREATLY INCREASED water savings
+        500, 350, 200,      # Reforestation (by scale) - good water savings
+        20, 15, 0,          # Clean Transportation (by scale) - can be zero
+        150, 100, 30,       # Waste Management (by scale)
+        250, 150, 50,       # Green Technology (by scale)
+        2500, 1800, 800,    # Ocean Conservation (by scale) - highest water savings
+    ])
+
+    # Columns: amount, category indicators, duration, scale, location code, technology code
+    schema = get_feature_schema()
+    n_categories = len(schema.categories)
+    X = schema.build_matrix(
+        X[:, 0], X[:, 1:1 + n_categories], X[:, schema.duration_column], X[:, schema.duration_column + 1],
+        X[:, schema.duration_column + 2], X[:, schema.duration_column + 3]
+    )
+
+    return X, {'carbon': y_carbon, 'energy': y_energy, 'water': y_water}
+
+
+def fit_models(X, y, n_estimators=100, max_depth=5, min_samples_split=5, random_state=42, multi_output=False):
+    """Fit the scaler and the forests on raw feature rows.
+
+    Returns (forests, scaler). By default there is one forest per target in
+    TARGETS order; with multi_output a single forest predicts all targets
+    from shared trees.
+    """
+    X = get_feature_schema().normalize(X)
+    scaler = StandardScaler().fit(X)
+    X_transformed = scaler.transform(X)
+
+    def new_forest():
+        return RandomForestRegressor(
+            n_estimators=n_estimators, max_depth=max_depth,
+            min_samples_split=min_samples_split, random_state=random_state
+        )
+
+    if multi_output:
+        return [new_forest().fit(X_transformed, np.column_stack([y[target] for target in TARGETS]))], scaler
+    return [new_forest().fit(X_transformed, y[target]) for target in TARGETS], scaler
+
+
+def predict_models(forests, scaler, X):
+    """Predict all targets for raw feature rows as an (N, len(TARGETS)) array"""
+    X_transformed = scaler.transform(get_feature_schema().normalize(X))
+    return np.column_stack([forest.predict(X_transformed) for forest in forests])
+
+
+def evaluate_models(X, y, folds=5, random_state=42, **params):
+    """Cross-validate fit_models and return {target: {'mae': ..., 'r2': ...}}"""
+    predictions = np.zeros((len(X), len(TARGETS)))
+    for train_index, test_index in KFold(n_splits=folds, shuffle=True, random_state=random_state).split(X):
+        forests, scaler = fit_models(X[train_index], {t: y[t][train_index] for t in TARGETS}, random_state=random_state, **params)
+        predictions[test_index] = predict_models(forests, scaler, X[test_index])
+
+    return {
+        target: {
+            'mae': float(mean_absolute_error(y[target], predictions[:, column])),
+            'r2': float(r2_score(y[target], predictions[:, column])),
+        }
+        for column, target in enumerate(TARGETS)
+    }
+
+
+def load_legacy_models():
+    """Load the pickled forests and scaler the calculator used before model bundles"""
+    loaded = {}
+    for name, path in LEGACY_MODEL_FILES.items():
+        with open(os.path.join(settings.BASE_DIR, path), 'rb') as f:
+            loaded[name] = pickle.load(f)
+    return [loaded[target] for target in TARGETS], loaded['scaler']
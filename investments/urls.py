@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('invest/<int:pk>/', views.invest_initiative, name='invest_initiative'),
     path('impact-preview/<int:pk>/', views.impact_preview, name='impact_preview'),
+    path('metrics/', views.impact_metrics, name='impact_metrics'),
     path('goals/add/', views.add_investment_goal, name='add_investment_goal'),
 ]
\ No newline at end of file
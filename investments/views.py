@@ -1,14 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from initiatives.models import Initiative
+from django.contrib.admin.views.decorators import staff_member_required
+from initiatives.models import FundingError, Initiative
 from .models import Investment, InvestmentGoal
-from .impact_calculator import ImpactCalculator
 from decimal import Decimal, InvalidOperation
 from django.contrib import messages
 from django.http import JsonResponse
+import logging
+from .batching import predict_impact
+from .impact_profiles import get_impact_profile
+from .instrumentation import metrics
 
-# Note: Avoid global instantiation of ImpactCalculator due to potential threading issues
-# We'll instantiate it within the view instead
+logger = logging.getLogger(__name__)
+
+# Impact predictions go through the process-wide calculator returned by
+# get_impact_calculator(), which loads the models once per worker
 
 @login_required
 def invest_initiative(request, pk):
@@ -21,17 +27,17 @@ def invest_initiative(request, pk):
     
     if request.method == 'POST':
         amount_str = request.POST.get('amount', '')
-        print(f"Original amount string: '{amount_str}'")
+        logger.debug("Original amount string: %r", amount_str)
         
         # Strip any commas, spaces or currency symbols
         amount_str = ''.join(c for c in amount_str if c.isdigit() or c == '.')
-        print(f"Cleaned amount string: '{amount_str}'")
+        logger.debug("Cleaned amount string: %r", amount_str)
         
         if amount_str:
             try:
                 # Convert to Decimal for precise financial calculations
                 amount = Decimal(amount_str)
-                print(f"Converted to Decimal: {amount}")
+                logger.debug("Converted to Decimal: %s", amount)
                 
                 # Check if accepting this investment would exceed goal amount
                 remaining_amount = initiative.goal_amount - initiative.current_amount
@@ -45,26 +51,15 @@ def invest_initiative(request, pk):
                 elif initiative.max_investment and amount > initiative.max_investment:
                     messages.error(request, f'Maximum investment amount is ₹{initiative.max_investment:,}')
                 else:
-                    # Create the investment
+                    # Create the investment; its impact is computed once on this path
                     try:
-                        investment = Investment(
-                            user=request.user,
-                            initiative=initiative,
-                            amount=amount
+                        # Saving also updates initiative's current_amount via the save method
+                        investment = Investment.invest(request.user, initiative, amount)
+                        logger.debug(
+                            "Impact calculation result: carbon=%s energy=%s water=%s",
+                            investment.carbon_impact, investment.energy_impact, investment.water_impact
                         )
                         
-                        # Calculate impact metrics
-                        impact = Investment.calculate_impact_for_amount(initiative, amount)
-                        print(f"Impact calculation result: {impact}")
-                        
-                        # Extract and convert impact values to float
-                        investment.carbon_impact = float(impact.get('carbon', 0))
-                        investment.energy_impact = float(impact.get('energy', 0))
-                        investment.water_impact = float(impact.get('water', 0))
-                        
-                        # Save the investment - this also updates initiative's current_amount via the save method
-                        investment.save()
-                        
                         # Clear any previous messages to prevent old errors from showing
                         storage = messages.get_messages(request)
                         storage.used = True
@@ -79,15 +74,18 @@ def invest_initiative(request, pk):
                         # Redirect to user's dashboard to see their holdings
                         return redirect('dashboard')
                         
+                    except FundingError as e:
+                        # Another investment got there first; the initiative was refreshed
+                        messages.error(request, str(e))
                     except Exception as e:
-                        print(f"Error saving investment: {str(e)}")
+                        logger.exception("Error saving investment in initiative %s", initiative.pk)
                         messages.error(request, f"An error occurred while processing your investment: {str(e)}")
                         
             except (ValueError, InvalidOperation) as e:
-                print(f"Error processing amount '{amount_str}': {e}")
+                logger.info("Error processing amount %r: %s", amount_str, e)
                 messages.error(request, 'Please enter a valid amount')
         else:
-            print("Amount string is empty")
+            logger.debug("Amount string is empty")
             messages.error(request, 'Please enter an investment amount')
     
     # Calculate impact metrics for the template using AI predictions
@@ -147,7 +145,7 @@ def impact_preview(request, pk):
     initiative = get_object_or_404(Initiative, pk=pk)
     try:
         amount_str = request.GET.get('amount', '')
-        print(f"Impact preview - original amount: '{amount_str}'")
+        logger.debug("Impact preview - original amount: %r", amount_str)
         
         # Clean the input similar to the invest view
         amount_str = ''.join(c for c in amount_str if c.isdigit() or c == '.')
@@ -162,8 +160,16 @@ def impact_preview(request, pk):
         elif initiative.max_investment and amount > initiative.max_investment:
             amount = initiative.max_investment
     except (ValueError, InvalidOperation) as e:
-        print(f"Impact preview - error processing amount: {e}")
+        logger.debug("Impact preview - error processing amount: %s", e)
         amount = initiative.min_investment
     
-    impact = Investment.calculate_impact_for_amount(initiative, amount)
-    return JsonResponse(impact)
\ No newline at end of file
+    # Keystroke previews from concurrent requests are resolved together by the batcher
+    with metrics.timer('impact.preview_ms'):
+        impact = predict_impact(get_impact_profile(initiative), amount)
+    return JsonResponse(impact)
+
+
+@staff_member_required
+def impact_metrics(request):
+    """Counters and latency histograms of this worker process as JSON"""
+    return JsonResponse(metrics.snapshot())
\ No newline at end of file
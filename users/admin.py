@@ -8,4 +8,5 @@ class CustomUserAdmin(UserAdmin):
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'carbon_reduced', 'energy_saved', 'water_conserved')
\ No newline at end of file
+    list_display = ('user', 'total_invested', 'investment_count', 'carbon_reduced', 'energy_saved', 'water_conserved')
+    readonly_fields = Profile.TOTAL_FIELDS
\ No newline at end of file
@@ -0,0 +1 @@
+# This file is required to make the management directory a Python package
\ No newline at end of file
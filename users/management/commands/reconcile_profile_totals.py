@@ -0,0 +1,95 @@
+import math
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from investments.bulk import update_rows
+from investments.models import Investment
+from investments.portfolio_cache import invalidate_portfolio_summaries
+from users.models import Profile
+
+
+def investment_totals(user_ids):
+    """{user_id: [total invested, count, carbon, energy, water]} summed from the investments"""
+    rows = (
+        Investment.objects.filter(user_id__in=user_ids).order_by().values('user_id')
+        .annotate(amount=Sum('amount'), count=Count('pk'), carbon=Sum('carbon_impact'),
+                  energy=Sum('energy_impact'), water=Sum('water_impact'))
+    )
+    return {
+        row['user_id']: [row['amount'], row['count'], row['carbon'], row['energy'], row['water']]
+        for row in rows
+    }
+
+
+def totals_match(stored, expected):
+    # The impact totals are floats summed in a different order, so allow rounding noise
+    return all(
+        math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6) if isinstance(a, float) else a == b
+        for a, b in zip(stored, expected)
+    )
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the users' profile investment totals from their investments and reports any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Profiles checked and written per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted profiles without fixing them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        dry_run = options['dry_run']
+
+        missing = get_user_model().objects.filter(profile__isnull=True)
+        if dry_run:
+            self.stdout.write(f"{missing.count()} users have no profile")
+        else:
+            Profile.objects.bulk_create([Profile(user_id=pk) for pk in missing.values_list('pk', flat=True)],
+                                        ignore_conflicts=True)
+
+        started = time.perf_counter()
+        checked = drifted = 0
+        last_pk = 0
+        while True:
+            # Lock the chunk's profiles before summing, so an investment saved meanwhile
+            # either is in the sums or applies its delta after this chunk is written
+            with transaction.atomic():
+                profiles = list(
+                    Profile.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                    .only('pk', 'user_id', *Profile.TOTAL_FIELDS)[:chunk_size]
+                )
+                if not profiles:
+                    break
+                totals = investment_totals([profile.user_id for profile in profiles])
+
+                changed = []
+                for profile in profiles:
+                    stored = [getattr(profile, name) for name in Profile.TOTAL_FIELDS]
+                    expected = totals.get(profile.user_id, [0, 0, 0.0, 0.0, 0.0])
+                    if totals_match(stored, expected):
+                        continue
+                    if options['verbosity'] > 1 or dry_run:
+                        self.stdout.write(f"  user {profile.user_id}: {stored} -> {expected}")
+                    for name, value in zip(Profile.TOTAL_FIELDS, expected):
+                        setattr(profile, name, value)
+                    changed.append(profile)
+                if changed and not dry_run:
+                    update_rows(Profile, changed, Profile.TOTAL_FIELDS)
+                    invalidate_portfolio_summaries([profile.user_id for profile in changed])
+
+            checked += len(profiles)
+            drifted += len(changed)
+            last_pk = profiles[-1].pk
+
+        elapsed = time.perf_counter() - started
+        summary = f"{checked} profiles in {elapsed:.2f}s, {drifted} with drifted totals"
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Dry run checked {summary}. No changes were made."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {summary}."))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_totals(apps, schema_editor):
+    # Same aggregation as the reconcile_profile_totals command, over the historical models
+    Investment = apps.get_model('investments', 'Investment')
+    Profile = apps.get_model('users', 'Profile')
+
+    # The impact fields were never maintained, so start every profile from zero
+    Profile.objects.update(carbon_reduced=0, energy_saved=0, water_conserved=0)
+    totals = (
+        Investment.objects.order_by().values('user_id')
+        .annotate(amount=Sum('amount'), count=Count('pk'), carbon=Sum('carbon_impact'),
+                  energy=Sum('energy_impact'), water=Sum('water_impact'))
+    )
+    for row in totals:
+        profile, _ = Profile.objects.get_or_create(user_id=row['user_id'])
+        profile.total_invested = row['amount']
+        profile.investment_count = row['count']
+        profile.carbon_reduced = row['carbon']
+        profile.energy_saved = row['energy']
+        profile.water_conserved = row['water']
+        profile.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_profile_address_line1_profile_address_line2_and_more'),
+        ('investments', '0009_investment_impact_model_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='total_invested',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='investment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
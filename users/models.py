@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 
 class CustomUser(AbstractUser):
@@ -22,9 +23,41 @@ class Profile(models.Model):
     country = models.CharField(max_length=100, blank=True, null=True)
     bio = models.TextField(blank=True, null=True, help_text="Tell us about yourself (max 500 characters)", max_length=500)
     
+    # Running totals of the user's investments, kept up to date by Investment.save() and delete()
+    total_invested = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    investment_count = models.PositiveIntegerField(default=0)
     carbon_reduced = models.FloatField(default=0.0)
     energy_saved = models.FloatField(default=0.0)
     water_conserved = models.FloatField(default=0.0)
 
+    TOTAL_FIELDS = ['total_invested', 'investment_count', 'carbon_reduced', 'energy_saved', 'water_conserved']
+
     def __str__(self):
-        return f"{self.user.username}'s Profile"
\ No newline at end of file
+        return f"{self.user.username}'s Profile"
+
+    def save(self, *args, **kwargs):
+        # The totals only change through add_investment_totals(); saving a profile
+        # loaded earlier must not overwrite deltas applied since
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def add_investment_totals(cls, user_id, amount=0, count=0, carbon=0.0, energy=0.0, water=0.0, create=True):
+        """Add deltas to a user's investment totals in one UPDATE, creating the profile if needed.
+
+        With create=False a missing profile is left alone, e.g. when the user is being deleted.
+        """
+        deltas = {
+            'total_invested': F('total_invested') + amount,
+            'investment_count': F('investment_count') + count,
+            'carbon_reduced': F('carbon_reduced') + carbon,
+            'energy_saved': F('energy_saved') + energy,
+            'water_conserved': F('water_conserved') + water,
+        }
+        if not cls.objects.filter(user_id=user_id).update(**deltas) and create:
+            cls.objects.get_or_create(user_id=user_id)
+            cls.objects.filter(user_id=user_id).update(**deltas)
@@ -1,3 +1,99 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from initiatives.models import Category, Initiative
+from investments.models import Investment
+from onboarding.models import OnboardingProgress
+from .models import CustomUser, Profile
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        # Cached summaries are keyed by user id, which the test database reuses
+        caches[settings.DASHBOARD_CACHE_ALIAS].clear()
+        self.user = CustomUser.objects.create_user(username='investor', email='investor@example.com')
+        OnboardingProgress.objects.create(
+            user=self.user, welcome_completed=True, interests_completed=True,
+            investment_profile_completed=True, tutorial_completed=True
+        )
+        self.client.force_login(self.user)
+        self.categories = [Category.objects.create(name=name) for name in ('Renewable Energy', 'Recycling')]
+
+    def invest(self, count):
+        for n in range(count):
+            initiative = Initiative.objects.create(
+                title=f'Initiative {Initiative.objects.count()}', description='Test', status='active',
+                goal_amount=Decimal('100000'), min_investment=Decimal('1')
+            )
+            initiative.categories.set(self.categories[:n % 2 + 1])
+            # Dashboard summaries are invalidated when the investment commits
+            with self.captureOnCommitCallbacks(execute=True):
+                Investment.objects.create(user=self.user, initiative=initiative, amount=Decimal('1000'))
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_investments(self):
+        self.invest(1)
+        _, few = self.dashboard_queries()
+        self.invest(9)
+        response, many = self.dashboard_queries()
+
+        self.assertEqual(many, few)
+        self.assertEqual(response.context['total_invested'], Decimal('10000'))
+        distribution = {row['name']: row['total'] for row in response.context['category_distribution']}
+        self.assertEqual(distribution, {'Renewable Energy': Decimal('10000'), 'Recycling': Decimal('4000')})
+
+    def test_summary_is_cached_until_the_user_invests(self):
+        self.invest(1)
+        _, uncached = self.dashboard_queries()
+        _, cached = self.dashboard_queries()
+        self.assertLess(cached, uncached)
+
+        self.invest(1)
+        response, queries = self.dashboard_queries()
+        self.assertEqual(queries, uncached)
+        self.assertEqual(response.context['total_invested'], Decimal('2000'))
+
+    def test_invalidation_from_another_worker_reaches_this_one(self):
+        self.invest(1)
+        self.dashboard_queries()
+
+        # Another worker process has its own connection to the shared cache
+        other_worker = caches.create_connection(settings.DASHBOARD_CACHE_ALIAS)
+        with mock.patch('investments.portfolio_cache.summary_cache', return_value=other_worker):
+            self.invest(1)
+
+        response, _ = self.dashboard_queries()
+        self.assertEqual(response.context['total_invested'], Decimal('2000'))
+
+    @override_settings(DASHBOARD_CACHE_ALIAS='default')
+    def test_summaries_are_not_cached_in_a_per_process_cache(self):
+        self.invest(1)
+        _, first = self.dashboard_queries()
+        _, second = self.dashboard_queries()
+        self.assertEqual(second, first)
+
+    def test_deleting_a_held_initiative_updates_the_totals(self):
+        self.invest(3)
+        self.dashboard_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Initiative.objects.filter(investments__user=self.user).first().delete()
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.total_invested, profile.investment_count), (Decimal('2000'), 2))
+        response, _ = self.dashboard_queries()
+        self.assertEqual(response.context['total_invested'], Decimal('2000'))
+        carbon = sum(investment.carbon_impact for investment in self.user.investments.all())
+        self.assertEqual(response.context['total_impact']['carbon'], round(carbon))
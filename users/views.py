@@ -10,13 +10,11 @@ from django.db.models.functions import Cast
 from investments.models import Investment
 from initiatives.models import Initiative, Category
 from .models import Profile
-from django.db.models.functions import TruncMonth
 import json
 from django.core.serializers.json import DjangoJSONEncoder
-from investments.portfolio_analyzer import PortfolioAnalyzer
+from investments.portfolio_cache import get_portfolio_summary
 from django.db.models.functions import Coalesce
 from django.db.models import DecimalField, FloatField
-from collections import defaultdict
 from onboarding.models import OnboardingProgress, UserPreference
 
 def register(request):
@@ -64,23 +62,26 @@ def dashboard(request):
             return redirect('onboarding_tutorial')
     
     user = request.user
-    investments = user.investments.all().select_related('initiative')
+    # Portfolio sections and totals come from a cached summary that investment
+    # and initiative changes invalidate
+    portfolio = get_portfolio_summary(user)
     
     # Get user preferences for personalized recommendations
     try:
         user_preferences = UserPreference.objects.get(user=user)
+        interested_category_ids = set(user_preferences.interested_categories.values_list('id', flat=True))
         
         # Query initiatives that match user preferences
         recommended_initiatives_query = Initiative.objects.filter(
             status='active'  # Use status='active' instead of is_active=True
         ).exclude(
-            id__in=[inv.initiative.id for inv in investments]  # Exclude already invested
+            id__in=portfolio['initiative_ids']  # Exclude already invested
         ).prefetch_related('categories')
         
         # Filter by user's interested categories if they selected any
-        if user_preferences.interested_categories.exists():
+        if interested_category_ids:
             recommended_initiatives_query = recommended_initiatives_query.filter(
-                categories__in=user_preferences.interested_categories.all()
+                categories__in=interested_category_ids
             ).distinct()
         
         # Filter by investment amount preferences
@@ -97,8 +98,8 @@ def dashboard(request):
             # Base score starts at 50%
             match_score = 50
             
-            # Add points for category match
-            if initiative.categories.filter(id__in=user_preferences.interested_categories.values_list('id', flat=True)).exists():
+            # Add points for category match, from the prefetched categories
+            if any(category.id in interested_category_ids for category in initiative.categories.all()):
                 match_score += 15
             
             # Add points for risk match (risk_level 1-3 maps to low, moderate, high)
@@ -129,85 +130,20 @@ def dashboard(request):
         user_preferences = None
         recommended_initiatives = []
     
-    # Calculate total invested amount
-    total_invested = investments.aggregate(
-        total=Coalesce(Sum('amount'), 0, output_field=DecimalField())
-    )['total']
-    
-    # Calculate total impact metrics using stored fields with explicit FloatField
-    total_impact = investments.aggregate(
-        carbon=Coalesce(Sum('carbon_impact'), 0, output_field=models.FloatField()),
-        energy=Coalesce(Sum('energy_impact'), 0, output_field=models.FloatField()),
-        water=Coalesce(Sum('water_impact'), 0, output_field=models.FloatField())
-    )
-    total_impact = {k: round(v) for k, v in total_impact.items()}
-    
-    # Initialize category impact dictionary
-    impact_by_category = defaultdict(lambda: {'carbon': 0, 'energy': 0, 'water': 0})
-    
-    # Group investments by initiative
-    grouped_investments = {}
-    for investment in investments:
-        initiative_id = investment.initiative.id
-        if (initiative_id) not in grouped_investments:
-            grouped_investments[initiative_id] = {
-                'initiative': investment.initiative,
-                'total_amount': 0,
-                'last_investment_date': investment.created_at,
-                'impact_metrics': {'carbon': 0, 'energy': 0, 'water': 0}
-            }
-        grouped_investments[initiative_id]['total_amount'] += investment.amount
-        grouped_investments[initiative_id]['impact_metrics']['carbon'] += investment.carbon_impact
-        grouped_investments[initiative_id]['impact_metrics']['energy'] += investment.energy_impact
-        grouped_investments[initiative_id]['impact_metrics']['water'] += investment.water_impact
-        
-        # Add to category impact
-        for category_name in [cat.name for cat in investment.initiative.categories.all()]:
-            impact_by_category[category_name]['carbon'] += investment.carbon_impact
-            impact_by_category[category_name]['energy'] += investment.energy_impact
-            impact_by_category[category_name]['water'] += investment.water_impact
-    
-    # Round category impacts
-    for category in impact_by_category:
-        impact_by_category[category] = {k: round(v) for k, v in impact_by_category[category].items()}
-    
-    # Get recent investments
-    recent_investments = sorted(
-        grouped_investments.values(),
-        key=lambda x: x['last_investment_date'],
-        reverse=True
-    )[:5]
-    for investment_data in recent_investments:
-        investment_data['impact_metrics'] = {k: round(v) for k, v in investment_data['impact_metrics'].items()}
-
-    # Get investment distribution by category
-    category_distribution = investments.values('initiative__categories__name').annotate(total=Sum('amount')).order_by('-total')
-    
-    # Get monthly investment trends
-    monthly_trends = investments.annotate(month=TruncMonth('created_at')).values('month').annotate(total=Sum('amount')).order_by('month')
-    
-    # Portfolio analysis
-    try:
-        analyzer = PortfolioAnalyzer()
-        portfolio_analysis = analyzer.get_diversification_recommendations(user)
-        portfolio_analysis['category_distribution'] = {k: float(v) for k, v in portfolio_analysis['category_distribution'].items()}
-        portfolio_analysis['technology_distribution'] = {k: float(v) for k, v in portfolio_analysis['technology_distribution'].items()}
-        portfolio_recommendations = portfolio_analysis['recommendations']
-    except Exception as e:
-        portfolio_analysis = {'category_distribution': {}, 'technology_distribution': {}, 'recommendations': []}
-        portfolio_recommendations = []
-        print(f"Portfolio analysis error: {str(e)}")
+    portfolio_analysis = portfolio['portfolio_analysis']
+    portfolio_analysis['category_distribution'] = {k: float(v) for k, v in portfolio_analysis['category_distribution'].items()}
+    portfolio_analysis['technology_distribution'] = {k: float(v) for k, v in portfolio_analysis['technology_distribution'].items()}
 
     context = {
         'user': user,
-        'total_invested': total_invested,
-        'total_impact': total_impact,
-        'recent_investments': recent_investments,
-        'category_distribution': category_distribution,
-        'monthly_trends': monthly_trends,
-        'impact_by_category': dict(impact_by_category),
+        'total_invested': portfolio['total_invested'],
+        'total_impact': portfolio['total_impact'],
+        'recent_investments': portfolio['recent_investments'],
+        'category_distribution': portfolio['category_distribution'],
+        'monthly_trends': portfolio['monthly_trends'],
+        'impact_by_category': portfolio['impact_by_category'],
         'portfolio_analysis': json.dumps(portfolio_analysis, cls=DjangoJSONEncoder),
-        'portfolio_recommendations': portfolio_recommendations,
+        'portfolio_recommendations': portfolio_analysis['recommendations'],
         'user_preferences': user_preferences,
         'recommended_initiatives': recommended_initiatives,
     }